@@ -0,0 +1,181 @@
+# Frame time benchmarks for MainScene, run headlessly with scripted input.
+# Prints per phase timings as percentiles so runs can be compared between
+# commits.
+#
+# Run from the repository root:
+#     python -m benchmarks.frame_time [scenario ...] [--frames N]
+#     python -m benchmarks.frame_time --replay session.rpgreplay [...]
+#
+# Replays recorded with replay_record in game_files/config.py play back the
+# exact input of a session, tick for tick.
+import argparse
+import contextlib
+import json
+import os
+import random
+import tempfile
+
+import pygame
+
+from game_files.headless import HeadlessRunner, create_scene, format_summary
+from game_files.headless import key_down, key_up, summarize
+from game_files.replay import Replay, create_replay_scene
+from game_files.scenes.main_scene import MainScene
+from game_files.tiles.paged_map import convert_map
+
+# Scenarios play on the single starting map, so walking off its edge doesn't
+# change the workload
+DEFAULT_MAP = "game_files/maps/map.json"
+
+# Temporary files made by scenarios, removed once the benchmarks have run
+temporary_files = contextlib.ExitStack()
+
+
+# Walk right for a while, then down, throwing a projectile every 10 frames
+def walk_and_shoot(frames: int) -> dict:
+    script = {}
+    for frame in range(0, frames, 10):
+        script[frame] = [key_down(pygame.K_SPACE), key_up(pygame.K_SPACE)]
+
+    script.setdefault(1, []).append(key_down(pygame.K_d))
+    script.setdefault(frames // 2, []).append(key_up(pygame.K_d))
+    script.setdefault(frames // 2 + 1, []).append(key_down(pygame.K_s))
+    return script
+
+
+def default_map(frames: int):
+    return create_scene(MainScene, map_path=DEFAULT_MAP), walk_and_shoot(frames)
+
+
+# Save a map made by a scenario, returning the path to it
+def write_map(name: str, map_spec: list[list]) -> str:
+    directory = temporary_files.enter_context(tempfile.TemporaryDirectory())
+    source = os.path.join(directory, name + ".json")
+    with open(source, "w") as map_file:
+        json.dump(map_spec, map_file)
+    return source
+
+
+def large_map(frames: int, size: int = 1000):
+    # A random map streamed from a binary map file
+    random.seed(0)
+    tile_ids = [0, 0, 0, 0, 71, 69, 79, 81, 91]
+    source = write_map(
+        "large", [[random.choice(tile_ids) for _ in range(size)] for _ in range(size)]
+    )
+    destination = os.path.splitext(source)[0] + ".rpgmap"
+    convert_map(source, destination)
+
+    return create_scene(MainScene, map_path=destination), walk_and_shoot(frames)
+
+
+def many_projectiles(frames: int, count: int = 10000):
+    scene = create_scene(MainScene, map_path=DEFAULT_MAP)
+    scene.projectiles.max_distance = float("inf")
+
+    random.seed(0)
+    for _ in range(count):
+        scene.projectiles.spawn(
+            random.uniform(-200, 1400),
+            random.uniform(-200, 900),
+            random.choice(["up", "down", "left", "right"]),
+            velocity=random.uniform(50, 150),
+        )
+
+    return scene, walk_and_shoot(frames)
+
+
+def many_enemies(frames: int, count: int = 500):
+    scene = create_scene(MainScene, map_path=DEFAULT_MAP)
+
+    random.seed(0)
+    for _ in range(count):
+        enemy = scene.spawn_enemy(random.uniform(0, 3000), random.uniform(0, 3000))
+        # Keep them alive for the whole run
+        scene.world.health[enemy] = float("inf")
+
+    return scene, walk_and_shoot(frames)
+
+
+def horde(frames: int, count: int = 2000):
+    # Enemies on walkable tiles all over the map, chasing the player
+    scene = create_scene(MainScene, map_path=DEFAULT_MAP)
+    grid = scene.navigation
+
+    random.seed(0)
+    spawned = 0
+    while spawned < count:
+        tile_x = random.randrange(grid.width)
+        tile_y = random.randrange(grid.height)
+        if grid.is_walkable(tile_x, tile_y):
+            enemy = scene.spawn_enemy(tile_x * grid.tilesize, tile_y * grid.tilesize)
+            scene.world.health[enemy] = float("inf")
+            spawned += 1
+
+    return scene, walk_and_shoot(frames)
+
+
+def walking_horde(frames: int, count: int = 2000, size: int = 200):
+    # Enemies all around a player walking across open ground the whole run,
+    # so the flow field is rebuilt as the player moves from tile to tile
+    scene = create_scene(MainScene, map_path=write_map("open", [[0] * size] * size))
+    grid = scene.navigation
+    middle = size // 2 * grid.tilesize
+    scene.player.teleport(middle, middle)
+    scene.camera.snap()
+
+    random.seed(0)
+    for _ in range(count):
+        enemy = scene.spawn_enemy(
+            middle + random.uniform(-40, 40) * grid.tilesize,
+            middle + random.uniform(-40, 40) * grid.tilesize,
+        )
+        scene.world.health[enemy] = float("inf")
+
+    return scene, walk_and_shoot(frames)
+
+
+SCENARIOS = {
+    "default_map": default_map,
+    "large_map": large_map,
+    "many_projectiles": many_projectiles,
+    "many_enemies": many_enemies,
+    "horde": horde,
+    "walking_horde": walking_horde,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Frame time benchmarks for MainScene")
+    parser.add_argument("scenarios", nargs="*", help=", ".join(SCENARIOS))
+    parser.add_argument("--frames", type=int, default=600)
+    parser.add_argument("--replay", nargs="+", default=[], help="replay files to play")
+    args = parser.parse_args()
+
+    for name in args.scenarios:
+        if name not in SCENARIOS:
+            parser.error("unknown scenario " + name)
+
+    for filename in args.replay:
+        replay = Replay(filename)
+        scene = create_replay_scene(replay)
+        timings = HeadlessRunner(scene, replay.dt).run(len(replay), replay=replay)
+        print(format_summary(os.path.basename(filename), summarize(timings)))
+
+    if args.replay and not args.scenarios:
+        pygame.quit()
+        return
+
+    with temporary_files:
+        for name in args.scenarios or SCENARIOS:
+            scene, script = SCENARIOS[name](args.frames)
+            timings = HeadlessRunner(scene).run(args.frames, script)
+            print(format_summary(name, summarize(timings)))
+            # Let go of streamed maps before their files are removed
+            del scene
+
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# Benchmarks the A* pathfinding service on a random map with rocks. Reports
+# how long whole searches take, then how many frames a crowd of path requests
+# takes to finish under the per tick budget and how many searches that ran,
+# and the cost of asking for paths that are already cached.
+#
+# Run from the repository root:
+#     python -m benchmarks.pathfinding [size] [requests]
+import random
+import sys
+import time
+
+from game_files.headless import percentile
+from game_files.pathfinding import NavigationGrid, PathfindingService, search
+from game_files.tiles.tile_layer import TileLayer
+
+
+def make_map_spec(size: int) -> list[list]:
+    random.seed(0)
+    # About one tile in five is a rock
+    return [[random.choice([0, 0, 0, 0, 71]) for _ in range(size)] for _ in range(size)]
+
+
+def random_walkable_tile(grid: NavigationGrid) -> tuple:
+    while True:
+        tile = (random.randrange(grid.width), random.randrange(grid.height))
+        if grid.is_walkable(*tile):
+            return tile
+
+
+def run_search(grid: NavigationGrid, start: tuple, goal: tuple) -> list:
+    steps = search(grid, start, goal)
+    try:
+        while True:
+            next(steps)
+    except StopIteration as finished:
+        return finished.value
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    request_count = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+
+    grid = NavigationGrid(TileLayer.from_spec(make_map_spec(size)), 64, [71])
+    random.seed(1)
+    pairs = [(random_walkable_tile(grid), random_walkable_tile(grid)) for _ in range(request_count)]
+
+    print(f"{size}x{size} map, {request_count} paths")
+
+    # Whole searches, one after another
+    timings = []
+    for start, goal in pairs[:100]:
+        began = time.perf_counter()
+        run_search(grid, start, goal)
+        timings.append((time.perf_counter() - began) * 1000)
+    print(
+        f"single search   p50 {percentile(timings, 50):8.2f} ms"
+        f"   p99 {percentile(timings, 99):8.2f} ms"
+    )
+
+    # Every request at once, worked on a little each frame
+    pathfinder = PathfindingService(grid)
+    requests = [pathfinder.request_path(start, goal) for start, goal in pairs]
+    frame_times = []
+    while not all(request.done for request in requests):
+        began = time.perf_counter()
+        pathfinder.update()
+        frame_times.append((time.perf_counter() - began) * 1000)
+    print(
+        f"budgeted        {len(frame_times):5d} frames"
+        f"   p50 {percentile(frame_times, 50):8.2f} ms   max {max(frame_times):8.2f} ms"
+        f"   {pathfinder.searches_completed} searches"
+    )
+
+    # The same requests again come straight from the cache
+    began = time.perf_counter()
+    for start, goal in pairs:
+        pathfinder.request_path(start, goal)
+    elapsed = (time.perf_counter() - began) * 1000
+    print(f"cached          {elapsed:8.2f} ms for {request_count} requests")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# Compares memory use and load time of the array backed tile layer against
+# building one Tile object per cell, the way Tilemap used to.
+#
+# Run from the repository root:
+#     python -m benchmarks.tilemap_memory [size]
+import os
+import sys
+import time
+import tracemalloc
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame
+
+from game_files.tiles.tilemap import Tile, Tilemap
+from game_files.tiles.tileset import Tileset
+
+
+def make_map_spec(size: int) -> list[list]:
+    # Grass everywhere with a rock every 7 tiles so the map is not uniform
+    return [[71 if (x * y) % 7 == 3 else 0 for x in range(size)] for y in range(size)]
+
+
+def build_tile_objects(map_spec: list[list], tileset: Tileset) -> list:
+    rows = []
+    for y, spec_row in enumerate(map_spec):
+        row = []
+        for x, tile_id in enumerate(spec_row):
+            row.append(
+                Tile(
+                    x * tileset.scaled_size,
+                    y * tileset.scaled_size,
+                    tileset.get_tile_sprite(tile_id),
+                    tile_id,
+                )
+            )
+        rows.append(row)
+    return rows
+
+
+def measure(name: str, function, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = function(*args)
+    elapsed = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(
+        f"{name:<14} load {elapsed * 1000:9.1f} ms"
+        f"   resident {current / 2**20:8.1f} MiB   peak {peak / 2**20:8.1f} MiB"
+    )
+    return result
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+
+    pygame.init()
+    pygame.display.set_mode((1, 1))
+    tileset = Tileset("gfx/rpg_sprites.png", 16, 4)
+    map_spec = make_map_spec(size)
+
+    print(f"{size}x{size} map")
+    measure("Tile objects", build_tile_objects, map_spec, tileset)
+    measure("Tilemap", Tilemap, map_spec, tileset)
+
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,47 +1,115 @@
 import pygame
 
 from game_files.animations.animation import Animation
-from game_files.tiles.tileset import Tileset
+from game_files.tiles.tileset import tileset_registry
 
+# Returned when nothing is playing
+EMPTY_SPRITE = pygame.Surface((0, 0))
 
-class AnimationManager:
+
+# Every animation an object can play. A set is built once and shared by all
+# objects that use the same sprite sheets.
+class AnimationSet:
     def __init__(self, sprite_sheets: dict, tile_size: int, scale: int):
         self.tilesets = {}
 
+        # Tilesets are shared with every other user of the same sheet
         for sprite in sprite_sheets:
-            tileset = Tileset("none", tile_size, scale, sprite_sheets[sprite])
-            self.tilesets[sprite] = tileset
+            self.tilesets[sprite] = tileset_registry.get(
+                sprite_sheets[sprite], tile_size, scale
+            )
 
         self.animations = {}
 
-        self.current_tileset = None
-
-        # Get whatever is first set in our tileset, this dummy animation
-        # shouldnt ever actually be played.
-        self.active_animation = Animation(
-            "dummy", self.tilesets[list(self.tilesets.keys())[0]], [0]
-        )
+    # Use a tileset that is already built, such as the tileset of a map
+    def add_tileset(self, name: str, tileset):
+        self.tilesets[name] = tileset
 
     def register_animation(self, name: str, sprite_ids: list[int], tileset: str):
         self.animations[name] = Animation(name, self.tilesets[tileset], sprite_ids)
 
+
+animation_sets = {}
+
+
+# Returns the shared animation set for these sprite sheets, building it with
+# register_animations the first time it is asked for
+def get_animation_set(
+    sprite_sheets: dict, tile_size: int, scale: int, register_animations
+) -> AnimationSet:
+    key = (register_animations, tile_size, scale, tuple(sprite_sheets.items()))
+
+    animation_set = animation_sets.get(key)
+    if animation_set is None:
+        animation_set = AnimationSet(sprite_sheets, tile_size, scale)
+        register_animations(animation_set)
+        animation_sets[key] = animation_set
+
+    return animation_set
+
+
+# Playback state of one object. This is created for the Player and for each
+# animated tile id, so it only holds a few numbers and a reference to the
+# shared animation set.
+class AnimationManager:
+    __slots__ = (
+        "animation_set",
+        "active_animation",
+        "current_keyframe",
+        "animation_frequency",
+        "loop_animation",
+        "keyframe_time",
+    )
+
+    def __init__(self, animation_set: AnimationSet):
+        self.animation_set = animation_set
+        self.active_animation = None
+
+        self.current_keyframe = 0
+        self.animation_frequency = 0
+        self.loop_animation = False
+        # This measure frame activity time and ensures animations dont mess up
+        # with game frames.
+        self.keyframe_time = 0
+
     def get_current_sprite(self) -> pygame.Surface:
         # If there is an active animation then get the sprite for that
         if self.active_animation is not None:
-            return self.active_animation.get_current_sprite()
+            return self.active_animation.get_sprite(self.current_keyframe)
         else:
             # if we have no animations happening return a dummy object
-            return pygame.Surface((0, 0))
+            return EMPTY_SPRITE
 
     def update(self, dt):
-        # if there is an active animation then run this
-        if self.active_animation is not None:
-            self.active_animation.update(dt)
+        # if there is no active animation then there is nothing to do
+        if self.active_animation is None:
+            return
+
+        self.keyframe_time += dt
+
+        if self.keyframe_time >= self.animation_frequency:
+            # Check to see if we are at the end of the animation loop
+            if len(self.active_animation.keyframes) - 1 <= self.current_keyframe:
+                # if at the end of the animation then restart it, otherwise
+                # stay on the last keyframe
+                if self.loop_animation is True:
+                    self.current_keyframe = 0
+                else:
+                    self.animation_frequency = 0
+
+            # If at the beginning or middle of animation loop then continue
+            # loop until reaching the end
+            else:
+                self.current_keyframe += 1
+
+            self.keyframe_time = 0
 
     def activate_animation(self, animation: str, frequency: float, loop: bool):
-        self.active_animation = self.animations[animation]
-        self.active_animation.animation_frequency = frequency
-        self.active_animation.loop_animation = loop
+        self.active_animation = self.animation_set.animations[animation]
+        self.animation_frequency = frequency
+        self.loop_animation = loop
+        self.current_keyframe = 0
+        self.keyframe_time = 0
 
     def deactivate_animation(self):
         self.active_animation = None
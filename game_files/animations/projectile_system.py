@@ -0,0 +1,190 @@
+import numpy as np
+import pygame
+
+from game_files.animations.animation_manager import AnimationSet, get_animation_set
+
+# Unit vector for each direction a projectile can be thrown in
+DIRECTIONS = {
+    "up": (0, -1),
+    "down": (0, 1),
+    "left": (-1, 0),
+    "right": (1, 0),
+}
+
+# Per projectile values, each stored in its own array
+FIELDS = {
+    "x": np.float64,
+    "y": np.float64,
+    "velocity_x": np.float64,
+    "velocity_y": np.float64,
+    "speed": np.float64,
+    "distance_traveled": np.float64,
+    "age": np.float64,
+    "damage": np.int32,
+    "alive": np.bool_,
+}
+
+
+def register_animations(animations: AnimationSet):
+    animations.register_animation("projectile", [0, 1, 2, 3, 4], "projectile")
+
+
+# Every live projectile in a scene. Projectiles are slots in preallocated
+# arrays rather than objects, so moving, ageing and expiring all of them is
+# a handful of array operations per frame no matter how many there are.
+# Slots of dead projectiles go on a free list and are reused by later spawns.
+class ProjectileSystem:
+    def __init__(
+        self,
+        sprite_sheets: dict,
+        capacity: int = 1024,
+        max_distance: int = 250,
+        frequency: float = 0.1,
+    ):
+        # Projectiles all play the same looping animation, so only the time
+        # since they were spawned is stored per projectile
+        animation_set = get_animation_set(sprite_sheets, 16, 2, register_animations)
+        self.sprites = animation_set.animations["projectile"].sprites
+        self.frequency = frequency
+
+        self.max_distance = max_distance
+        # Length of the last update, used to place projectiles between ticks
+        self.last_dt = 0
+        self.width = 16
+        self.height = 16
+        # Projectiles that hit a solid tile of this TileCollider are removed,
+        # None lets them fly over anything
+        self.collider = None
+
+        # Slots are handed out lowest index first
+        self.capacity = capacity
+        self.count = 0
+        self.free = list(range(capacity - 1, -1, -1))
+
+        for name, dtype in FIELDS.items():
+            setattr(self, name, np.zeros(capacity, dtype))
+
+    def grow(self):
+        capacity = self.capacity * 2
+
+        for name, dtype in FIELDS.items():
+            array = np.zeros(capacity, dtype)
+            array[:self.capacity] = getattr(self, name)
+            setattr(self, name, array)
+
+        self.free = list(range(capacity - 1, self.capacity - 1, -1))
+        self.capacity = capacity
+
+    def spawn(self, x, y, direction: str, velocity=500, damage: int = 10) -> int:
+        if not self.free:
+            self.grow()
+
+        index = self.free.pop()
+        direction_x, direction_y = DIRECTIONS[direction]
+
+        self.x[index] = x
+        self.y[index] = y
+        self.velocity_x[index] = direction_x * velocity
+        self.velocity_y[index] = direction_y * velocity
+        self.speed[index] = abs(velocity)
+        self.distance_traveled[index] = 0
+        self.age[index] = 0
+        self.damage[index] = damage
+        self.alive[index] = True
+        self.count += 1
+
+        return index
+
+    def kill(self, indices):
+        indices = np.atleast_1d(indices)
+        indices = indices[self.alive[indices]]
+
+        self.alive[indices] = False
+        self.velocity_x[indices] = 0
+        self.velocity_y[indices] = 0
+        self.speed[indices] = 0
+        self.free.extend(indices.tolist())
+        self.count -= len(indices)
+
+    def live_indices(self) -> np.ndarray:
+        return np.flatnonzero(self.alive)
+
+    def collide_rect(self, x, y, width, height) -> np.ndarray:
+        # Indices of live projectiles overlapping the given box
+        return np.flatnonzero(
+            self.alive
+            & (self.x < x + width)
+            & (self.x + self.width >= x)
+            & (self.y < y + height)
+            & (self.y + self.height >= y)
+        )
+
+    def update(self, dt):
+        self.last_dt = dt
+        if self.count == 0:
+            return
+
+        # Dead slots have no velocity, so the whole array can be moved at once
+        if self.collider is None:
+            self.x += self.velocity_x * dt
+            self.y += self.velocity_y * dt
+            hit_wall = False
+        else:
+            hit_wall = np.zeros(self.capacity, np.bool_)
+            live = self.live_indices()
+            self.x[live], self.y[live], hit_wall[live] = self.collider.move_many(
+                self.x[live],
+                self.y[live],
+                self.width,
+                self.height,
+                self.velocity_x[live] * dt,
+                self.velocity_y[live] * dt,
+            )
+        self.distance_traveled += self.speed * dt
+        self.age += dt
+
+        # If projectiles have moved further than the max distance, or into a
+        # solid tile, then they are removed
+        expired = np.flatnonzero(
+            self.alive & ((self.distance_traveled > self.max_distance) | hit_wall)
+        )
+        if len(expired) > 0:
+            self.kill(expired)
+
+    # The (sprite, screen position) of every projectile on screen
+    def get_sprites(self, screen_size: tuple, camera_adjustment: tuple, alpha: float = 1) -> list:
+        if self.count == 0:
+            return []
+
+        # Step back from the latest tick to where projectiles were at alpha,
+        # but not past where ones spawned this tick started
+        rewind = np.minimum((1 - alpha) * self.last_dt, self.age)
+        screen_x = self.x - self.velocity_x * rewind + camera_adjustment[0]
+        screen_y = self.y - self.velocity_y * rewind + camera_adjustment[1]
+
+        # Only draw projectiles that are on screen
+        visible = np.flatnonzero(
+            self.alive
+            & (screen_x > -self.width * 2)
+            & (screen_x < screen_size[0])
+            & (screen_y > -self.height * 2)
+            & (screen_y < screen_size[1])
+        )
+
+        frames = (self.age[visible] / self.frequency).astype(np.intp) % len(self.sprites)
+        sprites = self.sprites
+
+        return [
+            (sprites[frame], (x, y))
+            for frame, x, y in zip(
+                frames.tolist(),
+                screen_x[visible].tolist(),
+                screen_y[visible].tolist(),
+            )
+        ]
+
+    def render(self, screen: pygame.Surface, camera_adjustment: tuple, alpha: float = 1):
+        screen.blits(
+            self.get_sprites(screen.get_size(), camera_adjustment, alpha),
+            doreturn=False,
+        )
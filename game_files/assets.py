@@ -0,0 +1,90 @@
+import queue
+import threading
+import time
+
+import pygame
+
+from game_files.tiles.paged_map import load_map
+
+# Sprite sheets used by the scenes, by name
+SPRITE_FILES = {
+    "enemy_idle": "gfx/enemy_idle.png",
+    "player_walk": "gfx/player_animations.png",
+    "player_attack": "gfx/attack.png",
+    "projectile": "gfx/projectile.png",
+}
+
+
+# Load sprite textures into pygame as surfaces.
+# Returns a dictionary of names to surfaces.
+def load_sprites() -> dict:
+    sprites = {}
+
+    for name, filename in SPRITE_FILES.items():
+        sprites[name] = pygame.image.load(filename).convert_alpha()
+
+    return sprites
+
+
+# Loads assets on a worker thread so the game keeps drawing frames while they
+# are read. Images are decoded on the worker, but converting them to the
+# display's pixel format has to happen on the main thread, so update() is
+# called every frame to finish whatever has been loaded.
+class AssetLoader:
+    def __init__(self):
+        self.assets = {}
+        self.jobs = queue.Queue()
+        self.results = queue.Queue()
+        self.total = 0
+        self.finished = 0
+
+        self.thread = threading.Thread(target=self.work, daemon=True)
+        self.thread.start()
+
+    # load is run on the worker and finish, if given, on the main thread
+    def load(self, name: str, load, *args, finish=None):
+        self.total += 1
+        self.jobs.put((name, load, args, finish))
+
+    def load_image(self, name: str, filename: str):
+        self.load(name, pygame.image.load, filename, finish=pygame.Surface.convert_alpha)
+
+    def load_sprites(self):
+        for name, filename in SPRITE_FILES.items():
+            self.load_image(name, filename)
+
+    def load_map(self, name: str, filename: str):
+        self.load(name, load_map, filename)
+
+    def work(self):
+        while True:
+            name, load, args, finish = self.jobs.get()
+            try:
+                self.results.put((name, load(*args), finish, None))
+            except Exception as error:
+                self.results.put((name, None, None, error))
+
+    # Finish loaded assets until the time budget is spent. Errors from the
+    # worker are raised here, so they aren't lost on the other thread.
+    def update(self, budget: float = 0.004):
+        deadline = time.perf_counter() + budget
+        while time.perf_counter() < deadline:
+            try:
+                name, asset, finish, error = self.results.get_nowait()
+            except queue.Empty:
+                return
+
+            self.finished += 1
+            if error is not None:
+                raise error
+
+            self.assets[name] = finish(asset) if finish is not None else asset
+
+    @property
+    def done(self) -> bool:
+        return self.finished == self.total
+
+    # How much has been loaded, from 0 to 1
+    @property
+    def progress(self) -> float:
+        return self.finished / self.total if self.total else 1
@@ -0,0 +1,223 @@
+# Runs many MainScene simulations without a window, spread over a process
+# pool, to tune enemy health and projectile damage and velocity. Every
+# combination of the given values is played by each policy with each seed,
+# and stats for every run are written to a CSV file.
+#
+# Run from the repository root:
+#     python -m game_files.batch --health 30 60 --damage 10 20 --velocity 300 500
+#         [--policy aim random] [--seeds 4] [--seconds 60] [--workers N]
+#         [--output balancing.csv]
+import argparse
+import csv
+import itertools
+import math
+import operator
+import os
+import random
+
+from concurrent.futures import ProcessPoolExecutor
+
+from game_files.ecs import HEALTH, POSITION
+from game_files.headless import create_scene
+from game_files.replay import seed_random
+from game_files.scenes.main_scene import MainScene
+
+DIRECTIONS = ("up", "down", "left", "right")
+
+# Stats every run returns, after the parameters it was run with
+STATS = ("ticks", "kills", "time_to_first_kill", "time_to_kill", "projectiles_fired", "hits", "accuracy")
+
+
+# Policies decide what the player does each tick. One is made for each run
+# with the run's random number generator, and act() is given the scene and
+# the tick number and returns the direction to hold, or None, and whether to
+# attack.
+
+# Walk in a random direction for a while, or stand still, throwing now and
+# then
+class RandomPolicy:
+    def __init__(self, rng: random.Random):
+        self.rng = rng
+        self.direction = None
+
+    def act(self, scene: MainScene, tick: int) -> tuple:
+        if tick % 30 == 0:
+            self.direction = self.rng.choice(DIRECTIONS + (None,))
+        return self.direction, self.rng.random() < 0.1
+
+
+# Line up with the nearest enemy, get within range and throw at it
+class AimPolicy:
+    def __init__(self, rng: random.Random):
+        self.rng = rng
+
+    def act(self, scene: MainScene, tick: int) -> tuple:
+        world = scene.world
+        enemies = world.query(POSITION | HEALTH)
+        if len(enemies) == 0:
+            return None, False
+
+        player = scene.player
+        player_x = player.x + 32
+        player_y = player.y + 32
+        offset_x = world.x[enemies] + world.width[enemies] / 2 - player_x
+        offset_y = world.y[enemies] + world.height[enemies] / 2 - player_y
+        nearest = (offset_x**2 + offset_y**2).argmin()
+        dx = offset_x[nearest]
+        dy = offset_y[nearest]
+        reach = world.width[enemies[nearest]] / 2
+
+        # Throw along whichever axis the enemy is already lined up on
+        if abs(dy) < reach:
+            facing, distance = ("right" if dx > 0 else "left"), abs(dx)
+        elif abs(dx) < reach:
+            facing, distance = ("down" if dy > 0 else "up"), abs(dy)
+        elif abs(dx) < abs(dy):
+            return ("right" if dx > 0 else "left"), False
+        else:
+            return ("down" if dy > 0 else "up"), False
+
+        if player.direction != facing or distance > scene.projectiles.max_distance:
+            return facing, False
+        return None, tick % 10 == 0
+
+
+POLICIES = {
+    "aim": AimPolicy,
+    "random": RandomPolicy,
+}
+
+
+# Play one run to the end and return its parameters and stats. Runs in a
+# worker process, each with its own headless pygame.
+def run_simulation(run: dict) -> dict:
+    seed_random(run["seed"])
+    rng = random.Random(run["seed"])
+
+    scene = create_scene(MainScene, map_path=run["map_path"])
+    scene.enemy_health = run["enemy_health"]
+    scene.projectile_damage = run["projectile_damage"]
+    scene.projectile_velocity = run["projectile_velocity"]
+
+    # Start with a fresh set of enemies at random walkable spots
+    world = scene.world
+    world.destroy_entities(world.query(POSITION))
+    grid = scene.navigation
+    spawned = 0
+    while spawned < run["enemies"]:
+        tile_x = rng.randrange(grid.width)
+        tile_y = rng.randrange(grid.height)
+        if grid.is_walkable(tile_x, tile_y):
+            scene.spawn_enemy(tile_x * grid.tilesize, tile_y * grid.tilesize)
+            spawned += 1
+
+    policy = POLICIES[run["policy"]](rng)
+    state = scene.manager.input.state
+    dt = scene.manager.loop.dt
+    ticks = int(run["seconds"] / dt)
+
+    first_kill = None
+    tick = 0
+    while tick < ticks:
+        direction, attack = policy.act(scene, tick)
+        state.held = [direction] if direction is not None else []
+        state.pressed = {"attack"} if attack else set()
+
+        scene.update(dt)
+        scene.manager.input.end_tick()
+        tick += 1
+
+        alive = world.count
+        if first_kill is None and alive < run["enemies"]:
+            first_kill = tick * dt
+        if alive == 0:
+            break
+
+    result = dict(run)
+    result.update(
+        ticks=tick,
+        kills=run["enemies"] - world.count,
+        time_to_first_kill=first_kill,
+        time_to_kill=tick * dt if world.count == 0 else None,
+        projectiles_fired=scene.projectiles_fired,
+        hits=scene.hits,
+        accuracy=scene.hits / scene.projectiles_fired if scene.projectiles_fired else 0,
+    )
+    return result
+
+
+# Every combination of parameters, policy and seed
+def make_runs(args) -> list:
+    runs = []
+    for health, damage, velocity, policy, seed in itertools.product(
+        args.health, args.damage, args.velocity, args.policy, range(args.seeds)
+    ):
+        runs.append(
+            {
+                "enemy_health": health,
+                "projectile_damage": damage,
+                "projectile_velocity": velocity,
+                "policy": policy,
+                "seed": seed,
+                "enemies": args.enemies,
+                "seconds": args.seconds,
+                "map_path": args.map,
+            }
+        )
+    return runs
+
+
+def run_batch(runs: list, workers: int = None) -> list:
+    with ProcessPoolExecutor(workers) as pool:
+        # Hand runs out a few at a time so the pool isn't starved by the cost
+        # of sending each one
+        chunk_size = max(1, len(runs) // ((workers or os.cpu_count()) * 4))
+        return list(pool.map(run_simulation, runs, chunksize=chunk_size))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless balancing runs")
+    parser.add_argument("--health", type=float, nargs="+", default=[30])
+    parser.add_argument("--damage", type=int, nargs="+", default=[10])
+    parser.add_argument("--velocity", type=float, nargs="+", default=[500])
+    parser.add_argument("--policy", nargs="+", default=["aim"], help=", ".join(POLICIES))
+    parser.add_argument("--seeds", type=int, default=4)
+    parser.add_argument("--enemies", type=int, default=5)
+    parser.add_argument("--seconds", type=float, default=60)
+    parser.add_argument("--map", default="game_files/maps/map.json")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--output", default="balancing.csv")
+    args = parser.parse_args()
+
+    for policy in args.policy:
+        if policy not in POLICIES:
+            parser.error("unknown policy " + policy)
+
+    runs = make_runs(args)
+    results = run_batch(runs, args.workers)
+
+    with open(args.output, "w", newline="") as output_file:
+        writer = csv.DictWriter(output_file, list(runs[0]) + list(STATS))
+        writer.writeheader()
+        writer.writerows(results)
+
+    # Average time to kill everything for each combination, over the runs
+    # that managed it
+    print(f"{'health':>8}{'damage':>8}{'velocity':>10}{'policy':>8}{'cleared':>9}{'ttk':>8}{'accuracy':>10}")
+    combination = operator.itemgetter(
+        "enemy_health", "projectile_damage", "projectile_velocity", "policy"
+    )
+    for (health, damage, velocity, policy), group in itertools.groupby(results, combination):
+        group = list(group)
+        cleared = [result["time_to_kill"] for result in group if result["time_to_kill"] is not None]
+        time_to_kill = sum(cleared) / len(cleared) if cleared else math.nan
+        accuracy = sum(result["accuracy"] for result in group) / len(group)
+        print(
+            f"{health:>8g}{damage:>8g}{velocity:>10g}{policy:>8}"
+            f"{len(cleared):>5}/{len(group):<3}{time_to_kill:>8.1f}{accuracy:>10.2f}"
+        )
+    print(f"{len(results)} runs written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,34 +1,57 @@
 import pygame
 
+from game_files.text import get_font, render_text
+
 
 class Button:
     def __init__(self, x, y, text: str):
         self.x = x
         self.y = y
 
-        self.font = pygame.font.SysFont("Calibri", 36)
+        # Fonts are shared by every button
+        self.font = get_font("Calibri", 36)
         # Having the color seperate from the font allows you to change the
         # color when mouse hovers over text
         self.color = "white"
         self.text = text
 
-        self.text_surface = self.font.render(self.text, True, self.color)
+        self.text_surface = render_text(self.font, self.text, self.color)
         self.rect = self.text_surface.get_rect()
         self.rect.x = self.x
         self.rect.y = self.y
 
         # If the mouse is hovering above text
         self.hovered = False
+        # If the button looks different from the last time it was drawn, and
+        # the area of the screen it needs redrawn
+        self.dirty = True
+        self.dirty_rect = self.rect.copy()
 
         self.event = lambda: print("Default button")
 
     def update(self, dt):
         if self.hovered is True:
-            self.color = "blue"
+            color = "blue"
         else:
-            self.color = "white"
+            color = "white"
+
+        # Text is only rendered again when it actually changes
+        if color != self.color:
+            self.color = color
+            self.text_surface = render_text(self.font, self.text, self.color)
+            self.dirty = True
 
-        self.text_surface = self.font.render(self.text, True, self.color)
+    def set_text(self, text: str):
+        if text == self.text:
+            return
+
+        # The old text has to be cleared too, it may be wider
+        old_rect = self.rect
+        self.text = text
+        self.text_surface = render_text(self.font, self.text, self.color)
+        self.rect = self.text_surface.get_rect(topleft=(self.x, self.y))
+        self.dirty_rect = old_rect.union(self.rect)
+        self.dirty = True
 
     def set_hover(self, hovered: bool):
         self.hovered = hovered
@@ -38,3 +61,5 @@ class Button:
 
     def render(self, screen: pygame.Surface):
         screen.blit(self.text_surface, (self.x, self.y))
+        self.dirty = False
+        self.dirty_rect = self.rect.copy()
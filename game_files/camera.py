@@ -15,9 +15,28 @@ class Camera:
         self.camera_adjustment_x = (self.screen_width / 2) - self.subject.x
         self.camera_adjustment_y = (self.screen_height / 2) - self.subject.y
 
-    def get_camera_adjustments(self) -> tuple:
-        return (self.camera_adjustment_x, self.camera_adjustment_y)
+        # Adjustment as of the tick before, for blending between ticks
+        self.previous_adjustment_x = self.camera_adjustment_x
+        self.previous_adjustment_y = self.camera_adjustment_y
+
+    # alpha blends from the previous tick's adjustment (0) to the latest (1)
+    def get_camera_adjustments(self, alpha: float = 1) -> tuple:
+        return (
+            self.previous_adjustment_x
+            + (self.camera_adjustment_x - self.previous_adjustment_x) * alpha,
+            self.previous_adjustment_y
+            + (self.camera_adjustment_y - self.previous_adjustment_y) * alpha,
+        )
+
+    # Jump straight to the subject, without blending from the last tick
+    def snap(self):
+        self.update(0)
+        self.previous_adjustment_x = self.camera_adjustment_x
+        self.previous_adjustment_y = self.camera_adjustment_y
 
     def update(self, dt):
+        self.previous_adjustment_x = self.camera_adjustment_x
+        self.previous_adjustment_y = self.camera_adjustment_y
+
         self.camera_adjustment_x = (self.screen_width / 2) - self.subject.x
         self.camera_adjustment_y = (self.screen_height / 2) - self.subject.y
@@ -0,0 +1,188 @@
+import math
+
+import numpy as np
+
+from game_files import ecs
+from game_files.pathfinding import NavigationGrid
+
+
+# Moves boxes through a map without letting them into solid tiles. Which
+# tiles are solid comes from the map's walkable grid, so a move only looks up
+# the tiles the edge of a box sweeps over and costs the same on any size of
+# map. Everything outside the map is solid.
+class TileCollider:
+    def __init__(self, grid: NavigationGrid):
+        self.grid = grid
+        self.tilesize = grid.tilesize
+
+    # Whether any tile in the given column between two rows is solid
+    def column_is_solid(self, tile_x: int, first_y: int, last_y: int) -> bool:
+        is_walkable = self.grid.is_walkable
+        for tile_y in range(first_y, last_y + 1):
+            if not is_walkable(tile_x, tile_y):
+                return True
+        return False
+
+    def row_is_solid(self, tile_y: int, first_x: int, last_x: int) -> bool:
+        is_walkable = self.grid.is_walkable
+        for tile_x in range(first_x, last_x + 1):
+            if not is_walkable(tile_x, tile_y):
+                return True
+        return False
+
+    # Move a box by dx then dy, stopping it against the first solid tile in
+    # the way on each axis. Returns the new x and y, and whether the move was
+    # blocked along x and along y.
+    def move(self, x, y, width, height, dx, dy) -> tuple:
+        tilesize = self.tilesize
+        blocked_x = blocked_y = False
+
+        if dx:
+            first_y = math.floor(y / tilesize)
+            last_y = math.ceil((y + height) / tilesize) - 1
+            if dx > 0:
+                # Columns the right edge moves into
+                for tile_x in range(
+                    math.ceil((x + width) / tilesize), math.ceil((x + width + dx) / tilesize)
+                ):
+                    if self.column_is_solid(tile_x, first_y, last_y):
+                        dx = tile_x * tilesize - width - x
+                        blocked_x = True
+                        break
+            else:
+                for tile_x in range(
+                    math.floor(x / tilesize) - 1, math.floor((x + dx) / tilesize) - 1, -1
+                ):
+                    if self.column_is_solid(tile_x, first_y, last_y):
+                        dx = (tile_x + 1) * tilesize - x
+                        blocked_x = True
+                        break
+            x += dx
+
+        if dy:
+            first_x = math.floor(x / tilesize)
+            last_x = math.ceil((x + width) / tilesize) - 1
+            if dy > 0:
+                for tile_y in range(
+                    math.ceil((y + height) / tilesize), math.ceil((y + height + dy) / tilesize)
+                ):
+                    if self.row_is_solid(tile_y, first_x, last_x):
+                        dy = tile_y * tilesize - height - y
+                        blocked_y = True
+                        break
+            else:
+                for tile_y in range(
+                    math.floor(y / tilesize) - 1, math.floor((y + dy) / tilesize) - 1, -1
+                ):
+                    if self.row_is_solid(tile_y, first_x, last_x):
+                        dy = (tile_y + 1) * tilesize - y
+                        blocked_y = True
+                        break
+            y += dy
+
+        return x, y, blocked_x, blocked_y
+
+    # Whether each tile of the given arrays of tile positions is solid
+    def is_solid(self, tile_x: np.ndarray, tile_y: np.ndarray) -> np.ndarray:
+        return ~self.grid.are_walkable(tile_x, tile_y)
+
+    # Whether the column or row each edge moves into is solid. lines are the
+    # columns (or rows) moved into, first and last the range of rows (or
+    # columns) the box covers along the other axis.
+    def line_is_solid(self, lines, first, last, columns: bool) -> np.ndarray:
+        solid = np.zeros(len(lines), np.bool_)
+        span = int((last - first).max(initial=0))
+        for offset in range(span + 1):
+            other = first + offset
+            covered = other <= last
+            if columns:
+                solid |= covered & self.is_solid(lines, other)
+            else:
+                solid |= covered & self.is_solid(other, lines)
+        return solid
+
+    # move for arrays of boxes at once. Moves are split into steps of less
+    # than a tile, so each step can only cross one row and one column.
+    # Returns the new x and y arrays, and which boxes were blocked.
+    def move_many(self, x, y, width, height, dx, dy) -> tuple:
+        tilesize = self.tilesize
+        x = np.array(x, np.float64)
+        y = np.array(y, np.float64)
+        blocked = np.zeros(len(x), np.bool_)
+        if len(x) == 0:
+            return x, y, blocked
+
+        dx = np.broadcast_to(np.asarray(dx, np.float64), x.shape)
+        dy = np.broadcast_to(np.asarray(dy, np.float64), y.shape)
+        steps = max(1, math.ceil(max(np.abs(dx).max(), np.abs(dy).max()) / (tilesize - 1)))
+        dx = dx / steps
+        dy = dy / steps
+
+        for _ in range(steps):
+            step_x = dx.copy()
+            step_y = dy.copy()
+
+            # Along x, check the column each box's leading edge moves into
+            first_y = np.floor(y / tilesize).astype(np.intp)
+            last_y = np.ceil((y + height) / tilesize).astype(np.intp) - 1
+            right = step_x > 0
+            edge = np.where(right, x + width, x)
+            current = np.where(right, np.ceil(edge / tilesize) - 1, np.floor(edge / tilesize))
+            target = np.where(
+                right, np.ceil((edge + step_x) / tilesize) - 1, np.floor((edge + step_x) / tilesize)
+            )
+            crossing = (target != current) & (step_x != 0)
+            column = target.astype(np.intp)
+            hit = crossing & self.line_is_solid(column, first_y, last_y, True)
+            step_x[hit] = np.where(right, column * tilesize - width - x, (column + 1) * tilesize - x)[hit]
+            x += step_x
+            blocked |= hit
+
+            first_x = np.floor(x / tilesize).astype(np.intp)
+            last_x = np.ceil((x + width) / tilesize).astype(np.intp) - 1
+            down = step_y > 0
+            edge = np.where(down, y + height, y)
+            current = np.where(down, np.ceil(edge / tilesize) - 1, np.floor(edge / tilesize))
+            target = np.where(
+                down, np.ceil((edge + step_y) / tilesize) - 1, np.floor((edge + step_y) / tilesize)
+            )
+            crossing = (target != current) & (step_y != 0)
+            row = target.astype(np.intp)
+            hit = crossing & self.line_is_solid(row, first_x, last_x, False)
+            step_y[hit] = np.where(down, row * tilesize - height - y, (row + 1) * tilesize - y)[hit]
+            y += step_y
+            blocked |= hit
+
+        return x, y, blocked
+
+
+# Stops entities that moved this tick from ending up in solid tiles. Runs
+# after MovementSystem and sweeps each entity from where it was to where it
+# moved to. Only a footprint in the middle of the collider is tested, since
+# the collider covers the whole sprite and entities find their way by the
+# middle of it.
+class TileCollisionSystem:
+    def __init__(self, collider: TileCollider, footprint: int = 32):
+        self.collider = collider
+        self.footprint = footprint
+
+    def update(self, world: ecs.World, dt):
+        entities = world.query(ecs.POSITION | ecs.VELOCITY | ecs.COLLIDER)
+        if len(entities) == 0:
+            return
+
+        offset_x = (world.width[entities] - self.footprint) / 2
+        offset_y = (world.height[entities] - self.footprint) / 2
+        previous_x = world.previous_x[entities]
+        previous_y = world.previous_y[entities]
+
+        x, y, _ = self.collider.move_many(
+            previous_x + offset_x,
+            previous_y + offset_y,
+            self.footprint,
+            self.footprint,
+            world.x[entities] - previous_x,
+            world.y[entities] - previous_y,
+        )
+        world.x[entities] = x - offset_x
+        world.y[entities] = y - offset_y
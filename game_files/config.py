@@ -1,2 +1,32 @@
-map_height = 700
-map_width = 1550
\ No newline at end of file
+# Simulation ticks per second and the most frames drawn per second
+tick_rate = 60
+max_fps = 120
+
+# Keep the map drawn in a buffer that scrolls with the camera, so only tiles
+# coming on screen are drawn. False draws every tile on screen each frame.
+scroll_buffer = True
+
+# Map tiles that animate, tile id: (tile ids of each keyframe, seconds per keyframe)
+animated_tiles = {
+    11: ([11, 12, 13, 14], 0.25),
+}
+
+# Map tiles that can't be walked through: water, rocks and logs
+solid_tiles = [
+    11, 12, 13, 14, 15, 16, 22, 23, 24, 25, 26, 27, 36, 37, 38, 47, 48, 49,
+    58, 59, 60, 61, 62, 63, 64, 65, 71, 72,
+]
+
+# Map tiles that light can't pass through, for areas with lighting: rocks
+# and logs
+opaque_tiles = [58, 59, 60, 61, 62, 63, 64, 65, 71, 72]
+
+# Time each frame from the start, the overlay is toggled with F3 either way
+profiler_enabled = False
+# Where to save the profiler's trace when the game quits, a .json or .csv
+# file, or None to not save one
+profiler_trace = None
+
+# Where to save a replay of the game when it quits, a .rpgreplay file, or
+# None to not record one
+replay_record = None
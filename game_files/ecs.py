@@ -0,0 +1,251 @@
+import numpy as np
+import pygame
+
+from game_files.animations.animation import Animation
+
+# Components an entity can have, as bit flags in its mask
+POSITION = 1 << 0
+VELOCITY = 1 << 1
+ANIMATION = 1 << 2
+HEALTH = 1 << 3
+COLLIDER = 1 << 4
+CHASE = 1 << 5
+
+# Component data, one array per value. An entity is an index into these
+# arrays, so a system works on every entity it cares about with a few array
+# operations instead of calling a method on each object.
+COLUMNS = {
+    "mask": np.uint32,
+    # POSITION, with the position of the tick before for blending between ticks
+    "x": np.float64,
+    "y": np.float64,
+    "previous_x": np.float64,
+    "previous_y": np.float64,
+    # VELOCITY
+    "velocity_x": np.float64,
+    "velocity_y": np.float64,
+    # ANIMATION, playback state of an animation registered with the world
+    "animation_id": np.int32,
+    "keyframe": np.int32,
+    "keyframe_time": np.float64,
+    "animation_frequency": np.float64,
+    "loop_animation": np.bool_,
+    # HEALTH
+    "health": np.float64,
+    # COLLIDER
+    "width": np.float64,
+    "height": np.float64,
+    # CHASE, how fast the entity moves towards what it is chasing
+    "speed": np.float64,
+}
+
+
+# Holds every entity of a scene and the systems that run on them. Entity ids
+# are reused after an entity is destroyed.
+class World:
+    def __init__(self, capacity: int = 256):
+        self.capacity = capacity
+        self.count = 0
+        # Ids are handed out lowest first
+        self.free = list(range(capacity - 1, -1, -1))
+
+        for name, dtype in COLUMNS.items():
+            setattr(self, name, np.zeros(capacity, dtype))
+
+        # Animations are stored once and referred to by id
+        self.animations = []
+        self.animation_ids = {}
+        self.animation_lengths = np.zeros(0, np.int32)
+        self.animation_sizes = np.zeros((0, 2), np.int32)
+
+        self.systems = []
+
+    def grow(self):
+        capacity = self.capacity * 2
+
+        for name, dtype in COLUMNS.items():
+            column = np.zeros(capacity, dtype)
+            column[:self.capacity] = getattr(self, name)
+            setattr(self, name, column)
+
+        self.free = list(range(capacity - 1, self.capacity - 1, -1))
+        self.capacity = capacity
+
+    def register_animation(self, animation: Animation) -> int:
+        animation_id = self.animation_ids.get(animation)
+        if animation_id is None:
+            animation_id = len(self.animations)
+            self.animations.append(animation)
+            self.animation_ids[animation] = animation_id
+            self.animation_lengths = np.append(
+                self.animation_lengths, len(animation.keyframes)
+            ).astype(np.int32)
+            self.animation_sizes = np.vstack(
+                [self.animation_sizes, animation.sprites[0].get_size()]
+            ).astype(np.int32)
+
+        return animation_id
+
+    def create_entity(self) -> int:
+        if not self.free:
+            self.grow()
+
+        entity = self.free.pop()
+        for name in COLUMNS:
+            getattr(self, name)[entity] = 0
+        self.count += 1
+
+        return entity
+
+    def destroy_entities(self, entities):
+        entities = np.atleast_1d(entities)
+        entities = entities[self.mask[entities] != 0]
+
+        self.mask[entities] = 0
+        self.free.extend(entities.tolist())
+        self.count -= len(entities)
+
+    # Adding components
+    def add_position(self, entity: int, x, y):
+        self.mask[entity] |= POSITION
+        self.x[entity] = self.previous_x[entity] = x
+        self.y[entity] = self.previous_y[entity] = y
+
+    def add_velocity(self, entity: int, velocity_x=0, velocity_y=0):
+        self.mask[entity] |= VELOCITY
+        self.velocity_x[entity] = velocity_x
+        self.velocity_y[entity] = velocity_y
+
+    def add_animation(self, entity: int, animation: Animation, frequency: float, loop: bool):
+        self.mask[entity] |= ANIMATION
+        self.animation_id[entity] = self.register_animation(animation)
+        self.keyframe[entity] = 0
+        self.keyframe_time[entity] = 0
+        self.animation_frequency[entity] = frequency
+        self.loop_animation[entity] = loop
+
+    def add_health(self, entity: int, health):
+        self.mask[entity] |= HEALTH
+        self.health[entity] = health
+
+    def add_collider(self, entity: int, width, height):
+        self.mask[entity] |= COLLIDER
+        self.width[entity] = width
+        self.height[entity] = height
+
+    def add_chase(self, entity: int, speed):
+        self.mask[entity] |= CHASE
+        self.speed[entity] = speed
+
+    # Ids of every entity that has all of the given components
+    def query(self, components: int) -> np.ndarray:
+        return np.flatnonzero((self.mask & components) == components)
+
+    def add_system(self, system):
+        self.systems.append(system)
+
+    def update(self, dt):
+        for system in self.systems:
+            system.update(self, dt)
+
+
+# Moves everything that has a velocity
+class MovementSystem:
+    def update(self, world: World, dt):
+        entities = world.query(POSITION)
+        world.previous_x[entities] = world.x[entities]
+        world.previous_y[entities] = world.y[entities]
+
+        entities = world.query(POSITION | VELOCITY)
+        world.x[entities] += world.velocity_x[entities] * dt
+        world.y[entities] += world.velocity_y[entities] * dt
+
+
+# Steps animations the same way AnimationManager does, for all entities at once
+class AnimationSystem:
+    def update(self, world: World, dt):
+        entities = world.query(ANIMATION)
+        if len(entities) == 0:
+            return
+
+        keyframe_time = world.keyframe_time[entities] + dt
+        due = keyframe_time >= world.animation_frequency[entities]
+
+        keyframe = world.keyframe[entities]
+        at_end = keyframe >= world.animation_lengths[world.animation_id[entities]] - 1
+        loop = world.loop_animation[entities]
+
+        # Move on a keyframe, restart looping animations at the end and let
+        # the others stay on their last keyframe
+        keyframe = np.where(due & ~at_end, keyframe + 1, keyframe)
+        keyframe = np.where(due & at_end & loop, 0, keyframe)
+        world.keyframe[entities] = keyframe
+
+        stopped = entities[due & at_end & ~loop]
+        world.animation_frequency[stopped] = 0
+
+        world.keyframe_time[entities] = np.where(due, 0, keyframe_time)
+
+
+# Removes entities whose health has run out
+class HealthSystem:
+    def update(self, world: World, dt):
+        entities = world.query(HEALTH)
+        dead = entities[world.health[entities] <= 0]
+        if len(dead) > 0:
+            world.destroy_entities(dead)
+
+
+# Draws every animated entity with one blits call
+class RenderSystem:
+    # The (sprite, screen position) of every animated entity on screen
+    def get_sprites(
+        self,
+        world: World,
+        screen_size: tuple,
+        camera_adjustment: tuple,
+        alpha: float = 1,
+    ) -> list:
+        entities = world.query(POSITION | ANIMATION)
+        if len(entities) == 0:
+            return []
+
+        previous_x = world.previous_x[entities]
+        previous_y = world.previous_y[entities]
+        screen_x = previous_x + (world.x[entities] - previous_x) * alpha + camera_adjustment[0]
+        screen_y = previous_y + (world.y[entities] - previous_y) * alpha + camera_adjustment[1]
+
+        # Only draw entities that are on screen
+        sizes = world.animation_sizes[world.animation_id[entities]]
+        visible = (
+            (screen_x > -sizes[:, 0])
+            & (screen_x < screen_size[0])
+            & (screen_y > -sizes[:, 1])
+            & (screen_y < screen_size[1])
+        )
+        entities = entities[visible]
+        screen_x = screen_x[visible]
+        screen_y = screen_y[visible]
+
+        animations = world.animations
+        return [
+            (animations[animation_id].sprites[keyframe], (x, y))
+            for animation_id, keyframe, x, y in zip(
+                world.animation_id[entities].tolist(),
+                world.keyframe[entities].tolist(),
+                screen_x.tolist(),
+                screen_y.tolist(),
+            )
+        ]
+
+    def render(
+        self,
+        world: World,
+        screen: pygame.Surface,
+        camera_adjustment: tuple,
+        alpha: float = 1,
+    ):
+        screen.blits(
+            self.get_sprites(world, screen.get_size(), camera_adjustment, alpha),
+            doreturn=False,
+        )
@@ -0,0 +1,51 @@
+import time
+
+
+# Keeps the simulation running at a fixed tick rate no matter how fast frames
+# are drawn. Real time is collected every frame and spent in whole ticks of
+# dt, and whatever is left over becomes alpha, how far the game is between
+# the last tick and the next one, so rendering can blend between the two.
+# Frames are capped at max_fps by sleeping off the rest of each frame.
+class GameLoop:
+    def __init__(self, tick_rate: int = 60, max_fps: int = 120, max_frame_time: float = 0.25):
+        self.dt = 1 / tick_rate
+        # No cap when max_fps is 0 or None
+        self.frame_time = 1 / max_fps if max_fps else 0
+        # Longest real time one frame can account for. Stops a long stall,
+        # like dragging the window, from being followed by hundreds of ticks.
+        self.max_frame_time = max_frame_time
+
+        self.previous_time = None
+        self.frame_start = None
+        self.accumulator = 0
+        self.alpha = 0
+
+    def reset(self):
+        self.previous_time = None
+        self.accumulator = 0
+        self.alpha = 0
+
+    # Returns how many ticks to simulate this frame
+    def advance(self) -> int:
+        now = time.perf_counter()
+        if self.previous_time is None:
+            self.previous_time = now
+
+        self.accumulator += min(now - self.previous_time, self.max_frame_time)
+        self.previous_time = now
+        self.frame_start = now
+
+        ticks = int(self.accumulator / self.dt)
+        self.accumulator -= ticks * self.dt
+        self.alpha = self.accumulator / self.dt
+
+        return ticks
+
+    # Sleep until the next frame is due so a core is not spinning at 100%
+    def wait(self):
+        if not self.frame_time:
+            return
+
+        remaining = self.frame_start + self.frame_time - time.perf_counter()
+        if remaining > 0:
+            time.sleep(remaining)
@@ -0,0 +1,110 @@
+import os
+import time
+
+import pygame
+
+from game_files.assets import load_sprites
+from game_files.pygame_util import Scene, SceneManager
+
+# Phases of a frame that are timed, in the order they run
+PHASES = ("poll_events", "update", "render")
+
+
+# Starts pygame without opening a window. SDL's dummy video driver renders
+# into memory, so everything can run on machines with no display.
+def init_headless(screen_size: tuple = (1280, 720)) -> pygame.Surface:
+    os.environ["SDL_VIDEODRIVER"] = "dummy"
+    pygame.init()
+    return pygame.display.set_mode(screen_size)
+
+
+# Builds a scene ready to be driven headlessly. scene_class is called the same
+# way the game calls it, with any extra keyword arguments passed along.
+def create_scene(scene_class, screen_size: tuple = (1280, 720), **kwargs) -> Scene:
+    screen = init_headless(screen_size)
+    manager = SceneManager()
+    scene = scene_class(manager, screen, load_sprites(), **kwargs)
+    manager.initialize({"headless": scene}, "headless")
+    return scene
+
+
+# Helpers for building scripted input
+def key_down(key: int) -> pygame.event.Event:
+    return pygame.event.Event(pygame.KEYDOWN, key=key)
+
+
+def key_up(key: int) -> pygame.event.Event:
+    return pygame.event.Event(pygame.KEYUP, key=key)
+
+
+def percentile(samples: list, percent: float) -> float:
+    ordered = sorted(samples)
+    if not ordered:
+        return 0
+
+    index = (len(ordered) - 1) * percent / 100
+    lower = int(index)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (index - lower)
+
+
+# Drives a scene frame by frame as fast as possible with a fixed tick,
+# feeding it scripted input and timing each phase of every frame.
+class HeadlessRunner:
+    def __init__(self, scene: Scene, dt: float = 1 / 60):
+        self.scene = scene
+        self.dt = dt
+
+    # script is a dict of frame number to the list of events posted before
+    # that frame runs. A replay, if given, sets the input of every frame
+    # instead. Returns the seconds each phase took, frame by frame.
+    def run(self, frames: int, script: dict = None, replay=None, render: bool = True) -> dict:
+        timings = {phase: [] for phase in PHASES}
+        script = script or {}
+        input_handler = self.scene.manager.input
+
+        for frame in range(frames):
+            for event in script.get(frame, ()):
+                pygame.event.post(event)
+
+            start = time.perf_counter()
+            input_handler.poll()
+            if replay is not None:
+                replay.apply(input_handler.state, frame)
+            self.scene.poll_events()
+            polled = time.perf_counter()
+            self.scene.update(self.dt)
+            input_handler.end_tick()
+            updated = time.perf_counter()
+            if render:
+                self.scene.render(1)
+            rendered = time.perf_counter()
+
+            timings["poll_events"].append(polled - start)
+            timings["update"].append(updated - polled)
+            timings["render"].append(rendered - updated)
+
+        return timings
+
+
+def summarize(timings: dict, percents: tuple = (50, 90, 99)) -> dict:
+    # Milliseconds at each percentile for every phase and the whole frame
+    frames = [sum(phase_times) for phase_times in zip(*timings.values())]
+
+    summary = {}
+    for phase, samples in list(timings.items()) + [("frame", frames)]:
+        summary[phase] = {
+            f"p{percent}": percentile(samples, percent) * 1000 for percent in percents
+        }
+    return summary
+
+
+def format_summary(name: str, summary: dict) -> str:
+    percents = list(next(iter(summary.values())).keys())
+
+    lines = [f"{name:<16}" + "".join(f"{percent:>10}" for percent in percents)]
+    for phase, values in summary.items():
+        lines.append(
+            f"  {phase:<14}" + "".join(f"{values[percent]:>8.3f}ms" for percent in percents)
+        )
+    return "\n".join(lines)
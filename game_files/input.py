@@ -0,0 +1,100 @@
+import pygame
+
+# The only events the game reads. Everything else, mouse motion in
+# particular, is dropped by SDL before it reaches the queue.
+ALLOWED_EVENTS = [
+    pygame.QUIT,
+    pygame.KEYDOWN,
+    pygame.KEYUP,
+    pygame.MOUSEBUTTONDOWN,
+    pygame.WINDOWEXPOSED,
+    pygame.VIDEORESIZE,
+]
+
+# Keys every scene responds to, scenes add their own with bind()
+DEFAULT_ACTIONS = {
+    pygame.K_F3: "toggle_profiler",
+}
+
+
+# What the player is doing, as of the last time the event queue was read
+class InputState:
+    def __init__(self):
+        # Actions held down, in the order they were pressed
+        self.held = []
+        # Actions pressed since the last tick, so quick taps between ticks
+        # are not lost
+        self.pressed = set()
+        # Actions pressed, mouse buttons clicked and window events in the
+        # last frame only
+        self.frame_pressed = set()
+        self.clicks = []
+        self.quit = False
+        self.redraw = False
+
+    def is_held(self, action: str) -> bool:
+        return action in self.held
+
+    # The action out of the given ones that was pressed most recently and is
+    # still held, or None
+    def latest_held(self, actions) -> str:
+        for action in reversed(self.held):
+            if action in actions:
+                return action
+        return None
+
+
+# Reads the event queue once a frame and turns key presses into named
+# actions. Scenes look at the state instead of reading events themselves.
+class InputHandler:
+    def __init__(self, action_map: dict = None):
+        self.action_map = dict(DEFAULT_ACTIONS)
+        if action_map:
+            self.action_map.update(action_map)
+        self.state = InputState()
+        # A ReplayRecorder that is given the state of every tick
+        self.recorder = None
+
+        pygame.event.set_blocked(None)
+        pygame.event.set_allowed(ALLOWED_EVENTS)
+
+    # action_map is a dict of pygame key to action name
+    def bind(self, action_map: dict):
+        self.action_map.update(action_map)
+
+    def poll(self):
+        state = self.state
+        state.frame_pressed = set()
+        state.clicks = []
+        state.quit = False
+        state.redraw = False
+
+        for event in pygame.event.get():
+            if event.type == pygame.KEYDOWN:
+                action = self.action_map.get(event.key)
+                if action is not None:
+                    if action not in state.held:
+                        state.held.append(action)
+                    state.pressed.add(action)
+                    state.frame_pressed.add(action)
+
+            elif event.type == pygame.KEYUP:
+                action = self.action_map.get(event.key)
+                if action in state.held:
+                    state.held.remove(action)
+
+            elif event.type == pygame.MOUSEBUTTONDOWN:
+                state.clicks.append((event.button, event.pos))
+
+            elif event.type == pygame.QUIT:
+                state.quit = True
+
+            # The window was covered or resized
+            elif event.type in (pygame.WINDOWEXPOSED, pygame.VIDEORESIZE):
+                state.redraw = True
+
+    # Called after each tick, presses have been handled by then
+    def end_tick(self):
+        if self.recorder is not None:
+            self.recorder.record(self.state)
+        self.state.pressed.clear()
@@ -0,0 +1,459 @@
+import math
+
+from collections import OrderedDict
+
+import numpy as np
+import pygame
+
+from game_files.pathfinding import NavigationGrid
+from game_files.profiler import profiler
+from game_files.tiles.tilemap import Tilemap
+
+# How to turn the first octant's coordinates into each of the 8 octants, as
+# multipliers of x and y for the new x, then for the new y
+OCTANTS = (
+    (1, 0, 0, 1),
+    (0, 1, 1, 0),
+    (0, -1, 1, 0),
+    (-1, 0, 0, 1),
+    (-1, 0, 0, -1),
+    (0, -1, -1, 0),
+    (0, 1, -1, 0),
+    (1, 0, 0, -1),
+)
+
+
+# Copy the part of a grid of tiles that overlaps another. Both are arrays
+# indexed by tile y then x, starting from the given tiles.
+def paste(
+    target: np.ndarray,
+    target_x: int,
+    target_y: int,
+    source: np.ndarray,
+    source_x: int,
+    source_y: int,
+):
+    left = max(target_x, source_x)
+    top = max(target_y, source_y)
+    right = min(target_x + target.shape[1], source_x + source.shape[1])
+    bottom = min(target_y + target.shape[0], source_y + source.shape[0])
+    if left < right and top < bottom:
+        target[top - target_y:bottom - target_y, left - target_x:right - target_x] = source[
+            top - source_y:bottom - source_y, left - source_x:right - source_x
+        ]
+
+
+# Fill a surface with a colour per tile from an array indexed by tile y then
+# x, starting at x, y on the surface. Runs of the same colour along a row are
+# filled at once, since most of a dark area is the same colour.
+def fill_tiles(surface: pygame.Surface, colors: np.ndarray, tilesize: int, x=0, y=0):
+    for row, row_colors in enumerate(colors.tolist()):
+        top = y + row * tilesize
+        start = 0
+        while start < len(row_colors):
+            color = row_colors[start]
+            end = start + 1
+            while end < len(row_colors) and row_colors[end] == color:
+                end += 1
+            surface.fill(color, (x + start * tilesize, top, (end - start) * tilesize, tilesize))
+            start = end
+
+
+# Tiles that can be seen from tile x, y within radius tiles, as indexes into
+# the grid, by recursive shadowcasting. grid is a NavigationGrid of the tiles
+# light passes through, anything outside the map blocks it.
+def shadowcast(grid: NavigationGrid, x: int, y: int, radius: int) -> set:
+    visible = set()
+    if grid.is_walkable(x, y):
+        visible.add(y * grid.width + x)
+        for octant in OCTANTS:
+            cast_light(grid, visible, x, y, 1, 1.0, 0.0, radius, octant)
+    return visible
+
+
+# Scan one octant row by row out from the middle, between the start and end
+# slopes that aren't in shadow. Each tile that blocks light splits the scan,
+# with the rows past it scanned again with narrower slopes.
+def cast_light(
+    grid: NavigationGrid,
+    visible: set,
+    origin_x: int,
+    origin_y: int,
+    row: int,
+    start: float,
+    end: float,
+    radius: int,
+    octant: tuple,
+):
+    if start < end:
+        return
+
+    xx, xy, yx, yy = octant
+    width = grid.width
+    clear = grid.is_walkable
+    radius_squared = radius * radius
+    new_start = start
+
+    for distance in range(row, radius + 1):
+        dx = -distance - 1
+        dy = -distance
+        blocked = False
+        while dx <= 0:
+            dx += 1
+            x = origin_x + dx * xx + dy * xy
+            y = origin_y + dx * yx + dy * yy
+            # Slopes of the edges of this tile
+            left_slope = (dx - 0.5) / (dy + 0.5)
+            right_slope = (dx + 0.5) / (dy - 0.5)
+            if start < right_slope:
+                continue
+            elif end > left_slope:
+                break
+
+            tile_is_clear = clear(x, y)
+            if dx * dx + dy * dy < radius_squared and 0 <= x < width and 0 <= y < grid.height:
+                visible.add(y * width + x)
+
+            if blocked:
+                if not tile_is_clear:
+                    new_start = right_slope
+                else:
+                    blocked = False
+                    start = new_start
+            elif not tile_is_clear and distance < radius:
+                blocked = True
+                cast_light(
+                    grid,
+                    visible,
+                    origin_x,
+                    origin_y,
+                    distance + 1,
+                    start,
+                    left_slope,
+                    radius,
+                    octant,
+                )
+                new_start = right_slope
+
+        if blocked:
+            break
+
+
+# Fog of war and lighting for a Tilemap. Everything is worked out a colour
+# per tile, then drawn a tile at a time.
+#
+# - What the player can see is shadowcast from the tile they are on. Results
+#   are kept for recently visited tiles, so it is only worked out again when
+#   the player moves onto a new tile or a tile that blocks light is changed.
+#   Tiles seen before are remembered, drawn dimmer than ones in view.
+# - Static lights are baked into a light map per chunk of the tilemap when
+#   the chunk is first drawn. The light maps on screen, darkened by the fog,
+#   are only drawn again when the screen moves onto other tiles.
+# - Dynamic lights, like the player's torch, are added over those every
+#   frame, only the first max_dynamic_lights of them.
+#
+# The result multiplies the screen with BLEND_MULT, so white is full
+# brightness and black is unlit.
+class Lighting:
+    def __init__(
+        self,
+        tilemap: Tilemap,
+        sight: NavigationGrid,
+        spec: dict,
+        max_dynamic_lights: int = 8,
+        max_cached_views: int = 16,
+        max_cached_light_maps: int = 256,
+    ):
+        self.tilemap = tilemap
+        self.sight = sight
+        self.tilesize = tilemap.tilesize
+        self.chunk_size = tilemap.chunk_size
+
+        # Colour of tiles no light reaches, and how far the player can see
+        self.ambient = tuple(spec.get("ambient", (255, 255, 255)))
+        self.sight_radius = spec.get("sight", 8)
+        # Brightness of tiles that have been seen but are out of view
+        self.remembered = spec.get("remembered", 0.35)
+        # Static lights as tile x, tile y, radius in tiles, colour
+        self.lights = [
+            (x, y, radius, tuple(color)) for x, y, radius, color in spec.get("lights", [])
+        ]
+        # The player's torch as radius in tiles and colour
+        self.torch = spec.get("torch", [4, [255, 220, 160]])
+
+        self.max_dynamic_lights = max_dynamic_lights
+
+        # Tiles the player has seen, one byte per tile
+        self.explored = np.zeros((sight.height, sight.width), np.uint8)
+
+        # Player tile: visible tiles, recently used last
+        self.views = OrderedDict()
+        self.max_cached_views = max_cached_views
+        # What is in view from the tile the player is on, and the brightness
+        # of each tile of the fog around them from tile fog_x, fog_y
+        self.view_tile = None
+        self.visible = set()
+        self.fog = None
+        self.fog_x = 0
+        self.fog_y = 0
+
+        # Chunk: colour of each tile, recently used last
+        self.light_maps = OrderedDict()
+        self.max_cached_light_maps = max_cached_light_maps
+        # Static light: (first tile x, first tile y, brightness of each tile)
+        self.light_reach = {}
+        # Radius and colour: light sprite, for dynamic lights, and radius:
+        # surface the fog under them is drawn to
+        self.light_sprites = {}
+        self.fog_patches = {}
+
+        # The static light in the fog over the tiles on screen, which tiles
+        # it covers, and the same with dynamic lights added
+        self.base = None
+        self.base_window = None
+        self.frame = None
+
+        # Version of the sight grid everything was worked out from
+        self.version = sight.version
+
+    # Drop everything worked out from the tiles once a tile that blocks
+    # light has been changed. Tiles that have been seen stay seen.
+    def check_sight(self):
+        if self.version != self.sight.version:
+            self.version = self.sight.version
+            self.views.clear()
+            self.view_tile = None
+            self.light_maps.clear()
+            self.light_reach.clear()
+
+    # Indexes of the tiles the player can see from a tile
+    def get_view(self, tile_x: int, tile_y: int) -> set:
+        key = (tile_x, tile_y)
+        visible = self.views.get(key)
+        if visible is None:
+            profiler.count("fov_casts")
+            visible = shadowcast(self.sight, tile_x, tile_y, self.sight_radius)
+            self.views[key] = visible
+            if len(self.views) > self.max_cached_views:
+                self.views.popitem(last=False)
+        else:
+            self.views.move_to_end(key)
+        return visible
+
+    # The brightness, 0 to 1, of each tile a static light reaches
+    def get_light_reach(self, light: tuple) -> tuple:
+        reach = self.light_reach.get(light)
+        if reach is not None:
+            return reach
+
+        light_x, light_y, radius, _ = light
+        size = radius * 2 + 1
+        brightness = np.zeros((size, size))
+
+        lit = np.fromiter(shadowcast(self.sight, light_x, light_y, radius), np.intp)
+        lit_x = lit % self.sight.width
+        lit_y = lit // self.sight.width
+        # Fades out to nothing at the radius
+        distance = np.hypot(lit_x - light_x, lit_y - light_y)
+        brightness[lit_y - light_y + radius, lit_x - light_x + radius] = np.clip(
+            1 - distance / radius, 0, 1
+        )
+
+        reach = (light_x - radius, light_y - radius, brightness)
+        self.light_reach[light] = reach
+        return reach
+
+    # The colour of each tile of a chunk from ambient and static light
+    def bake_light_map(self, chunk_x: int, chunk_y: int) -> np.ndarray:
+        size = self.chunk_size
+        first_x = chunk_x * size
+        first_y = chunk_y * size
+        light = np.empty((size, size, 3))
+        light[:] = self.ambient
+
+        added = np.zeros((size, size))
+        for static_light in self.lights:
+            light_x, light_y, radius, color = static_light
+            if (
+                light_x + radius < first_x
+                or light_x - radius >= first_x + size
+                or light_y + radius < first_y
+                or light_y - radius >= first_y + size
+            ):
+                continue
+
+            reach_x, reach_y, brightness = self.get_light_reach(static_light)
+            added[:] = 0
+            paste(added, first_x, first_y, brightness, reach_x, reach_y)
+            light += added[:, :, None] * color
+
+        return np.clip(light, 0, 255).astype(np.uint8)
+
+    def get_light_map(self, chunk_x: int, chunk_y: int) -> np.ndarray:
+        key = (chunk_x, chunk_y)
+        light_map = self.light_maps.get(key)
+        if light_map is None:
+            light_map = self.bake_light_map(chunk_x, chunk_y)
+            self.light_maps[key] = light_map
+            if len(self.light_maps) > self.max_cached_light_maps:
+                self.light_maps.popitem(last=False)
+        else:
+            self.light_maps.move_to_end(key)
+        return light_map
+
+    # Full brightness where the player can see, dim where they have been and
+    # none everywhere else, for the tiles from first_x, first_y
+    def make_fog(self, visible: set, first_x: int, first_y: int, width: int, height: int):
+        fog = np.zeros((height, width), np.uint8)
+        # Only the part of the explored tiles under the fog is scaled
+        paste(fog, first_x, first_y, self.explored, 0, 0)
+        fog *= int(255 * self.remembered)
+
+        seen = np.fromiter(visible, np.intp)
+        seen_x = seen % self.sight.width - first_x
+        seen_y = seen // self.sight.width - first_y
+        inside = (seen_x >= 0) & (seen_x < width) & (seen_y >= 0) & (seen_y < height)
+        fog[seen_y[inside], seen_x[inside]] = 255
+
+        return fog
+
+    # A soft round light for dynamic lights, added onto the light of the
+    # tiles under it
+    def get_light_sprite(self, radius: int, color: tuple) -> pygame.Surface:
+        key = (radius, color)
+        sprite = self.light_sprites.get(key)
+        if sprite is None:
+            offsets = np.arange(radius * 2) - radius + 0.5
+            distance = np.hypot(offsets[:, None], offsets[None, :])
+            brightness = np.clip(1 - distance / radius, 0, 1)[:, :, None] * color
+            sprite = pygame.Surface((radius * 2, radius * 2))
+            pygame.surfarray.blit_array(sprite, brightness.astype(np.uint8))
+            self.light_sprites[key] = sprite
+        return sprite
+
+    # The light over the screen and where it goes. camera_adjustment should
+    # be in whole pixels, the same as the tiles were drawn with. lights are
+    # dynamic lights as x, y, radius in pixels and colour, most important
+    # first. Submit the result with BLEND_MULT.
+    def get_sprite(
+        self,
+        screen_size: tuple,
+        camera_adjustment: tuple,
+        player_tile: tuple,
+        lights: list,
+    ) -> tuple:
+        self.check_sight()
+        tilesize = self.tilesize
+
+        # Tiles on screen, plus one for the part tile at each edge
+        first_x = math.floor(-camera_adjustment[0] / tilesize)
+        first_y = math.floor(-camera_adjustment[1] / tilesize)
+        width = math.ceil(screen_size[0] / tilesize) + 1
+        height = math.ceil(screen_size[1] / tilesize) + 1
+        origin_x = first_x * tilesize
+        origin_y = first_y * tilesize
+        position = (origin_x + camera_adjustment[0], origin_y + camera_adjustment[1])
+
+        # What the player can see only changes when they move to a new tile.
+        # The fog covers the screen around them with a tile to spare, since
+        # the camera follows them.
+        if self.view_tile != player_tile:
+            self.view_tile = player_tile
+            self.visible = self.get_view(*player_tile)
+            self.explored.reshape(-1)[np.fromiter(self.visible, np.intp)] = 1
+
+            self.fog_x = player_tile[0] - width // 2 - 1
+            self.fog_y = player_tile[1] - height // 2 - 1
+            self.fog = self.make_fog(self.visible, self.fog_x, self.fog_y, width + 2, height + 2)
+            self.base_window = None
+
+        # Static light in the fog only changes when the screen moves onto
+        # other tiles, so it is drawn then and kept
+        window = (first_x, first_y, width, height)
+        if self.base_window != window:
+            self.base_window = window
+            if self.base is None or self.base.get_size() != (width * tilesize, height * tilesize):
+                self.base = pygame.Surface((width * tilesize, height * tilesize))
+                self.frame = self.base.copy()
+
+            light = np.empty((height, width, 3), np.uint8)
+            light[:] = self.ambient
+            size = self.chunk_size
+            for chunk_y in range(
+                max(0, first_y // size),
+                min(self.tilemap.chunks_high, (first_y + height) // size + 1),
+            ):
+                for chunk_x in range(
+                    max(0, first_x // size),
+                    min(self.tilemap.chunks_wide, (first_x + width) // size + 1),
+                ):
+                    paste(
+                        light,
+                        first_x,
+                        first_y,
+                        self.get_light_map(chunk_x, chunk_y),
+                        chunk_x * size,
+                        chunk_y * size,
+                    )
+
+            fog = np.zeros((height, width), np.uint16)
+            paste(fog, first_x, first_y, self.fog, self.fog_x, self.fog_y)
+            fill_tiles(self.base, (light * fog[:, :, None] // 255).astype(np.uint8), tilesize)
+
+        # Dynamic lights over the top, only the ones on tiles the player can
+        # see. Each is darkened by the fog of the tiles under it first, so
+        # lights don't show what the player can't see.
+        frame = None
+        drawn = 0
+        for x, y, radius, color in lights:
+            if drawn >= self.max_dynamic_lights:
+                break
+            if int(y // tilesize) * self.sight.width + int(x // tilesize) not in self.visible:
+                continue
+
+            if frame is None:
+                frame = self.frame
+                frame.blit(self.base, (0, 0))
+
+            left = int(x) - radius
+            top = int(y) - radius
+            tile_x = left // tilesize
+            tile_y = top // tilesize
+            fog = np.zeros(
+                (
+                    (top + radius * 2) // tilesize - tile_y + 1,
+                    (left + radius * 2) // tilesize - tile_x + 1,
+                ),
+                np.uint8,
+            )
+            paste(fog, tile_x, tile_y, self.fog, self.fog_x, self.fog_y)
+
+            light = self.get_light_sprite(radius, color)
+            if fog.min() < 255:
+                patch = self.fog_patches.get(radius)
+                if patch is None:
+                    patch = pygame.Surface((radius * 2, radius * 2))
+                    self.fog_patches[radius] = patch
+                fill_tiles(
+                    patch,
+                    np.repeat(fog[:, :, None], 3, axis=2),
+                    tilesize,
+                    tile_x * tilesize - left,
+                    tile_y * tilesize - top,
+                )
+                light = light.copy()
+                light.blit(patch, (0, 0), special_flags=pygame.BLEND_MULT)
+            frame.blit(light, (left - origin_x, top - origin_y), special_flags=pygame.BLEND_ADD)
+            drawn += 1
+        profiler.count("dynamic_lights", drawn)
+
+        if frame is None:
+            return self.base, position
+        return frame, position
+
+    def get_memory_size(self) -> int:
+        size = self.explored.nbytes
+        size += sum(light_map.nbytes for light_map in self.light_maps.values())
+        if self.base is not None:
+            size += self.base.get_width() * self.base.get_height() * self.base.get_bytesize() * 2
+        return size
@@ -0,0 +1,548 @@
+import heapq
+import math
+
+from collections import OrderedDict, deque
+
+import numpy as np
+
+from game_files import ecs
+from game_files.tiles.tile_layer import EMPTY_TILE
+
+# Steps to the 8 neighbouring tiles and what each costs
+NEIGHBOURS = (
+    (1, 0, 1),
+    (-1, 0, 1),
+    (0, 1, 1),
+    (0, -1, 1),
+    (1, 1, math.sqrt(2)),
+    (1, -1, math.sqrt(2)),
+    (-1, 1, math.sqrt(2)),
+    (-1, -1, math.sqrt(2)),
+)
+
+# The same steps as arrays, plus the index of the step going the other way
+STEP_X = np.array([step[0] for step in NEIGHBOURS], np.intp)
+STEP_Y = np.array([step[1] for step in NEIGHBOURS], np.intp)
+OPPOSITE = (1, 0, 3, 2, 7, 6, 5, 4)
+# For each diagonal step, the straight steps to the two tiles it passes
+# between. Straight steps come first, so they are looked at before these.
+CORNERS = (None, None, None, None, (0, 2), (0, 3), (1, 2), (1, 3))
+
+# How many tiles a search looks at before checking if it is out of time
+EXPANSIONS_PER_STEP = 128
+
+# Tiles along each side of a NavigationGrid region, for layers that aren't
+# split into regions already
+REGION_SIZE = 16
+
+
+# Which tiles of a tile layer can be walked on, one byte per tile. The map is
+# split into square regions, each worked out from the layer's tile ids the
+# first time a tile in it is asked for, so streamed maps are never read whole.
+# At most max_resident_regions are kept, dropping the oldest first; a dropped
+# region is worked out again from the layer, which keeps any edits. Kept up
+# to date as tiles are changed once it watches the layer's Tilemap.
+class NavigationGrid:
+    def __init__(
+        self, layer, tilesize: int, solid_tile_ids, max_resident_regions: int = 4096
+    ):
+        self.layer = layer
+        self.width = layer.width
+        self.height = layer.height
+        self.tilesize = tilesize
+
+        # Anything outside the map counts as solid too
+        self.solid = set(solid_tile_ids) | {EMPTY_TILE}
+        # Looked up for a whole region at once, by tile id
+        self.walkable_ids = np.ones(EMPTY_TILE + 1, np.uint8)
+        self.walkable_ids[list(self.solid)] = 0
+
+        # Regions line up with a paged map's, so each only decodes one of its
+        # regions
+        self.region_size = getattr(layer, "region_size", REGION_SIZE)
+        self.regions_wide = -(-self.width // self.region_size)
+        self.regions_high = -(-self.height // self.region_size)
+        # Walkable bytes of each region, None until it is needed
+        self.regions = [None] * (self.regions_wide * self.regions_high)
+        self.resident = deque()
+        self.max_resident_regions = max_resident_regions
+
+        # Bumped whenever walkability changes, so cached paths can be dropped
+        self.version = 0
+
+    def watch(self, tilemap):
+        tilemap.add_edit_listener(self.on_tile_changed)
+
+    def load_region(self, index: int) -> bytearray:
+        size = self.region_size
+        first_x = index % self.regions_wide * size
+        first_y = index // self.regions_wide * size
+        last_x = min(first_x + size, self.width)
+
+        tiles = np.full((size, size), EMPTY_TILE, np.uint16)
+        for y in range(first_y, min(first_y + size, self.height)):
+            tiles[y - first_y, :last_x - first_x] = self.layer.get_row(y, first_x, last_x)
+
+        region = bytearray(self.walkable_ids[tiles].tobytes())
+        self.regions[index] = region
+        self.resident.append(index)
+        if len(self.resident) > self.max_resident_regions:
+            self.regions[self.resident.popleft()] = None
+        return region
+
+    def on_tile_changed(self, x: int, y: int, tile_id: int):
+        size = self.region_size
+        region = self.regions[y // size * self.regions_wide + x // size]
+        walkable = tile_id not in self.solid
+        if region is None:
+            # The layer already has the new tile, but whether it changed
+            # walkability isn't known, so cached paths are dropped anyway
+            self.version += 1
+        elif region[y % size * size + x % size] != walkable:
+            region[y % size * size + x % size] = walkable
+            self.version += 1
+
+    def is_walkable(self, x: int, y: int) -> bool:
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return False
+        size = self.region_size
+        index = y // size * self.regions_wide + x // size
+        region = self.regions[index] or self.load_region(index)
+        return region[y % size * size + x % size]
+
+    # Walkability of the tiles in a rectangle as a height x width array,
+    # with tiles outside the map not walkable
+    def get_area(self, x: int, y: int, width: int, height: int) -> np.ndarray:
+        size = self.region_size
+        area = np.zeros((height, width), np.uint8)
+        for region_y in range(max(y, 0) // size, min(-(-(y + height) // size), self.regions_high)):
+            for region_x in range(
+                max(x, 0) // size, min(-(-(x + width) // size), self.regions_wide)
+            ):
+                index = region_y * self.regions_wide + region_x
+                region = self.regions[index] or self.load_region(index)
+                region = np.frombuffer(region, np.uint8).reshape(size, size)
+
+                # Where the region and the rectangle overlap, in map tiles
+                first_x = max(region_x * size, x)
+                first_y = max(region_y * size, y)
+                end_x = min((region_x + 1) * size, x + width, self.width)
+                end_y = min((region_y + 1) * size, y + height, self.height)
+                area[first_y - y:end_y - y, first_x - x:end_x - x] = region[
+                    first_y - region_y * size:end_y - region_y * size,
+                    first_x - region_x * size:end_x - region_x * size,
+                ]
+        return area
+
+    # Whether each tile of the given arrays of tile positions is walkable
+    def are_walkable(self, tile_x: np.ndarray, tile_y: np.ndarray) -> np.ndarray:
+        size = self.region_size
+        inside = (tile_x >= 0) & (tile_x < self.width) & (tile_y >= 0) & (tile_y < self.height)
+        index = np.where(inside, tile_y // size * self.regions_wide + tile_x // size, -1)
+        offset = tile_y % size * size + tile_x % size
+
+        # The regions needed, one row each, then every tile looked up at once
+        needed = np.unique(index[inside])
+        if len(needed) == 0:
+            return inside
+        table = np.stack(
+            [
+                np.frombuffer(self.regions[region] or self.load_region(region), np.uint8)
+                for region in needed.tolist()
+            ]
+        )
+        row = np.searchsorted(needed, index[inside])
+        walkable = np.zeros(len(index), np.bool_)
+        walkable[inside] = table[row, offset[inside]] != 0
+        return walkable
+
+    def get_memory_size(self) -> int:
+        return len(self.resident) * self.region_size * self.region_size
+
+    # The tile a point in the world is on
+    def tile_at(self, x, y) -> tuple:
+        return (int(x // self.tilesize), int(y // self.tilesize))
+
+
+# A* search from start to goal as a generator. It yields every few
+# expansions so it can be spread across frames, and returns the list of tiles
+# to walk through, or an empty list when the goal can't be reached. Tiles are
+# kept as indexes into the map, row by row, while searching.
+def search(grid: NavigationGrid, start: tuple, goal: tuple):
+    if not grid.is_walkable(*start) or not grid.is_walkable(*goal):
+        return []
+
+    width = grid.width
+    height = grid.height
+    is_walkable = grid.is_walkable
+    # Looked up straight from the grid's regions, it is the inner loop
+    regions = grid.regions
+    size = grid.region_size
+    regions_wide = grid.regions_wide
+    goal_x, goal_y = goal
+    start_index = start[1] * width + start[0]
+    goal_index = goal_y * width + goal_x
+    diagonal = math.sqrt(2) - 1
+
+    came_from = {start_index: -1}
+    cost = {start_index: 0}
+    frontier = [(0, start_index)]
+    expansions = 0
+
+    while frontier:
+        _, current = heapq.heappop(frontier)
+        if current == goal_index:
+            path = []
+            while current != -1:
+                path.append((current % width, current // width))
+                current = came_from[current]
+            path.reverse()
+            return path
+
+        x = current % width
+        y = current // width
+        current_cost = cost[current]
+        # Whether each neighbour so far can be walked on
+        walkable = []
+        for index, (step_x, step_y, step_cost) in enumerate(NEIGHBOURS):
+            next_x = x + step_x
+            next_y = y + step_y
+            if not (0 <= next_x < width and 0 <= next_y < height):
+                walkable.append(False)
+                continue
+            region = regions[next_y // size * regions_wide + next_x // size]
+            if region is None:
+                open_tile = is_walkable(next_x, next_y)
+            else:
+                open_tile = region[next_y % size * size + next_x % size]
+            walkable.append(open_tile)
+            if not open_tile:
+                continue
+            # Don't cut the corners of solid tiles
+            corners = CORNERS[index]
+            if corners is not None and not (walkable[corners[0]] and walkable[corners[1]]):
+                continue
+
+            neighbour = next_y * width + next_x
+            new_cost = current_cost + step_cost
+            if new_cost < cost.get(neighbour, math.inf):
+                cost[neighbour] = new_cost
+                came_from[neighbour] = current
+                # Octile distance, the cheapest possible cost with diagonal moves
+                dx = abs(next_x - goal_x)
+                dy = abs(next_y - goal_y)
+                estimate = (dx + diagonal * dy) if dx > dy else (dy + diagonal * dx)
+                heapq.heappush(frontier, (new_cost + estimate, neighbour))
+
+        expansions += 1
+        if expansions % EXPANSIONS_PER_STEP == 0:
+            yield
+
+    return []
+
+
+class PathRequest:
+    __slots__ = ("start", "goal", "search", "path", "done")
+
+    def __init__(self, start: tuple, goal: tuple, search):
+        self.start = start
+        self.goal = goal
+        self.search = search
+        self.path = []
+        self.done = False
+
+
+# Finds paths without stalling frames. Searches are queued and each tick
+# update() works on them until its budget is spent, carrying on next tick
+# where it stopped. Finished paths are cached until the walkable tiles change.
+#
+# The budget is counted in search steps rather than seconds so the game
+# plays out the same on every machine, which replays rely on.
+class PathfindingService:
+    def __init__(self, grid: NavigationGrid, budget: int = 4, max_cached_paths: int = 1024):
+        self.grid = grid
+        # Search steps per tick, each looks at EXPANSIONS_PER_STEP tiles
+        self.budget = budget
+
+        self.pending = OrderedDict()
+        self.paths = OrderedDict()
+        self.max_cached_paths = max_cached_paths
+        self.grid_version = grid.version
+
+        # How many searches finished, for benchmarks
+        self.searches_completed = 0
+
+    def request_path(self, start: tuple, goal: tuple) -> PathRequest:
+        self.check_grid()
+        key = (start, goal)
+
+        request = self.paths.get(key)
+        if request is not None:
+            self.paths.move_to_end(key)
+            return request
+
+        request = self.pending.get(key)
+        if request is None:
+            request = PathRequest(start, goal, search(self.grid, start, goal))
+            self.pending[key] = request
+
+        return request
+
+    # Drop paths found before the map changed. Searches still going are
+    # ended with no path, so whoever asked for them asks again.
+    def check_grid(self):
+        if self.grid.version != self.grid_version:
+            self.grid_version = self.grid.version
+            self.paths.clear()
+            for request in self.pending.values():
+                request.search = None
+                request.done = True
+            self.pending.clear()
+
+    def update(self):
+        self.check_grid()
+
+        for _ in range(self.budget):
+            if not self.pending:
+                return
+
+            key, request = next(iter(self.pending.items()))
+            try:
+                next(request.search)
+                # Give the other searches a turn
+                self.pending.move_to_end(key)
+            except StopIteration as finished:
+                request.path = finished.value
+                request.done = True
+                request.search = None
+                del self.pending[key]
+                self.searches_completed += 1
+
+                self.paths[key] = request
+                if len(self.paths) > self.max_cached_paths:
+                    self.paths.popitem(last=False)
+
+
+# Distances to one target tile within a square around it, filled in by
+# Dijkstra's algorithm. Each tile stores which neighbour to step to next, so
+# any number of entities can find their way to the target by looking up the
+# tile they stand on. The field is only rebuilt when the target moves to
+# another tile or the map changes, a slice at a time like path searches, and
+# the old field is used until the new one is ready.
+class FlowField:
+    def __init__(self, grid: NavigationGrid, radius: int = 48, budget: int = 4):
+        self.grid = grid
+        # How many tiles around the target the field covers
+        self.radius = radius
+        # Build steps per tick, each looks at EXPANSIONS_PER_STEP tiles
+        self.budget = budget
+
+        self.target = None
+        self.grid_version = grid.version
+        self.building = None
+        # Target of the field last built or being built
+        self.field_target = None
+
+        # Top left tile of the field and, for every tile in it, the index in
+        # NEIGHBOURS of the step towards the target or -1 for none
+        self.origin_x = 0
+        self.origin_y = 0
+        self.steps = np.full((0, 0), -1, np.int8)
+
+    # A build takes longer than walking across a tile, so one in progress is
+    # finished before moving to a new target, and the last finished field
+    # is used meanwhile. Walkability changing starts again straight away.
+    def set_target(self, tile: tuple):
+        self.target = tile
+        if self.grid.version != self.grid_version:
+            self.grid_version = self.grid.version
+            self.building = None
+            self.field_target = None
+
+        if self.building is None and tile != self.field_target:
+            self.field_target = tile
+            self.building = self.build(tile)
+
+    def update(self):
+        if self.building is None:
+            return
+
+        try:
+            for _ in range(self.budget):
+                next(self.building)
+        except StopIteration:
+            self.building = None
+
+    def build(self, target: tuple):
+        grid = self.grid
+        target_x, target_y = target
+
+        origin_x = max(target_x - self.radius, 0)
+        origin_y = max(target_y - self.radius, 0)
+        end_x = min(target_x + self.radius + 1, grid.width)
+        end_y = min(target_y + self.radius + 1, grid.height)
+        width = end_x - origin_x
+        height = end_y - origin_y
+
+        steps = np.full((height, width), -1, np.int8)
+        if not grid.is_walkable(target_x, target_y):
+            self.origin_x, self.origin_y, self.steps = origin_x, origin_y, steps
+            return
+
+        # Only the tiles inside the field, as bytes so looking one up is quick.
+        # An edit while building starts the build again, so they can't go stale.
+        walkable = grid.get_area(origin_x, origin_y, width, height).tobytes()
+
+        # Walk out from the target. Reaching a tile by one step means the way
+        # back is the opposite step, which is what the tile stores.
+        start = (target_y - origin_y) * width + target_x - origin_x
+        cost = {start: 0}
+        frontier = [(0, start)]
+        expansions = 0
+
+        while frontier:
+            current_cost, current = heapq.heappop(frontier)
+            if current_cost > cost[current]:
+                continue
+
+            # Tiles in the field, relative to its top left
+            x = current % width
+            y = current // width
+            for index, (step_x, step_y, step_cost) in enumerate(NEIGHBOURS):
+                next_x = x + step_x
+                next_y = y + step_y
+                if not (0 <= next_x < width and 0 <= next_y < height):
+                    continue
+                neighbour = next_y * width + next_x
+                if not walkable[neighbour]:
+                    continue
+                if step_x and step_y and not (
+                    walkable[y * width + next_x] and walkable[next_y * width + x]
+                ):
+                    continue
+
+                new_cost = current_cost + step_cost
+                if new_cost < cost.get(neighbour, math.inf):
+                    cost[neighbour] = new_cost
+                    steps[next_y, next_x] = OPPOSITE[index]
+                    heapq.heappush(frontier, (new_cost, neighbour))
+
+            expansions += 1
+            if expansions % EXPANSIONS_PER_STEP == 0:
+                yield
+
+        self.origin_x, self.origin_y, self.steps = origin_x, origin_y, steps
+
+    # Steps to take from each of the given tiles, as arrays of x steps, y
+    # steps and whether the tile has a step at all
+    def get_steps(self, tile_x: np.ndarray, tile_y: np.ndarray) -> tuple:
+        height, width = self.steps.shape
+        local_x = tile_x - self.origin_x
+        local_y = tile_y - self.origin_y
+        inside = (local_x >= 0) & (local_x < width) & (local_y >= 0) & (local_y < height)
+
+        steps = np.full(len(tile_x), -1, np.int8)
+        steps[inside] = self.steps[local_y[inside], local_x[inside]]
+        has_step = steps >= 0
+        return STEP_X[steps] * has_step, STEP_Y[steps] * has_step, has_step
+
+
+# Moves entities with the CHASE component towards a target, such as the
+# player. Entities near the target follow the flow field, when there is one,
+# so each costs the same however many there are. The rest are given A* paths,
+# which are asked for again when the target moves to another tile.
+class ChaseSystem:
+    def __init__(self, pathfinder: PathfindingService, target, flow_field: FlowField = None):
+        self.pathfinder = pathfinder
+        self.grid = pathfinder.grid
+        self.target = target
+        self.flow_field = flow_field
+        # entity: [path request, index of the next tile to walk to]
+        self.routes = {}
+        # Routes are found again once the walkable tiles change
+        self.grid_version = self.grid.version
+
+    # Chase through a different map
+    def set_pathfinder(self, pathfinder: PathfindingService, flow_field: FlowField = None):
+        self.pathfinder = pathfinder
+        self.grid = pathfinder.grid
+        self.flow_field = flow_field
+        self.routes.clear()
+        self.grid_version = self.grid.version
+
+    def update(self, world: ecs.World, dt):
+        tilesize = self.grid.tilesize
+        goal = self.grid.tile_at(self.target.x + tilesize / 2, self.target.y + tilesize / 2)
+
+        entities = world.query(ecs.POSITION | ecs.VELOCITY | ecs.COLLIDER | ecs.CHASE)
+        if self.grid.version != self.grid_version:
+            self.grid_version = self.grid.version
+            self.routes.clear()
+        if self.routes:
+            chasing = set(entities.tolist())
+            for entity in list(self.routes):
+                if entity not in chasing:
+                    del self.routes[entity]
+
+        # Entities walk by the middle of their collider
+        xs = world.x[entities] + world.width[entities] / 2
+        ys = world.y[entities] + world.height[entities] / 2
+        tile_x = (xs // tilesize).astype(np.intp)
+        tile_y = (ys // tilesize).astype(np.intp)
+
+        at_goal = (tile_x == goal[0]) & (tile_y == goal[1])
+        world.velocity_x[entities[at_goal]] = 0
+        world.velocity_y[entities[at_goal]] = 0
+        steered = at_goal
+
+        if self.flow_field is not None:
+            self.flow_field.set_target(goal)
+            step_x, step_y, has_step = self.flow_field.get_steps(tile_x, tile_y)
+            has_step &= ~at_goal
+
+            # Head for the middle of the tile the field points to
+            offset_x = (tile_x + step_x + 0.5) * tilesize - xs
+            offset_y = (tile_y + step_y + 0.5) * tilesize - ys
+            distance = np.hypot(offset_x, offset_y)
+            distance[distance == 0] = 1
+            speed = world.speed[entities] / distance
+
+            moving = entities[has_step]
+            world.velocity_x[moving] = (offset_x * speed)[has_step]
+            world.velocity_y[moving] = (offset_y * speed)[has_step]
+            steered = steered | has_step
+
+        for entity, x, y, tile in zip(
+            entities[~steered].tolist(),
+            xs[~steered].tolist(),
+            ys[~steered].tolist(),
+            zip(tile_x[~steered].tolist(), tile_y[~steered].tolist()),
+        ):
+            self.follow_path(world, entity, x, y, tile, goal, dt)
+
+    def follow_path(self, world: ecs.World, entity: int, x, y, tile: tuple, goal: tuple, dt):
+        tilesize = self.grid.tilesize
+
+        route = self.routes.get(entity)
+        if route is None or (route[0].done and route[0].goal != goal):
+            route = [self.pathfinder.request_path(tile, goal), 1]
+            self.routes[entity] = route
+
+        request, index = route
+        if not request.done or index >= len(request.path):
+            world.velocity_x[entity] = 0
+            world.velocity_y[entity] = 0
+            return
+
+        # Head for the middle of the next tile on the path
+        next_x = (request.path[index][0] + 0.5) * tilesize
+        next_y = (request.path[index][1] + 0.5) * tilesize
+        distance = math.hypot(next_x - x, next_y - y)
+        speed = world.speed[entity]
+
+        if distance <= speed * dt:
+            route[1] += 1
+
+        if distance > 0:
+            world.velocity_x[entity] = (next_x - x) / distance * speed
+            world.velocity_y[entity] = (next_y - y) / distance * speed
@@ -1,38 +1,22 @@
-import pygame
+from game_files import ecs
+from game_files.animations.animation_manager import AnimationSet, get_animation_set
 
-from game_files.animations.animation_manager import AnimationManager
 
+def register_animations(animations: AnimationSet):
+    animations.register_animation("idle", [0, 1, 2, 3, 4], "enemy_idle")
 
-class Enemy:
-    def __init__(self, sprite_sheets: dict, x, y):
-        self.sprite_sheets = sprite_sheets
-        self.x = x
-        self.y = y
-        self.health = 30
-        self.width = 200
-        self.height = 200
 
-        # Enemy sprite, pixil count, and size scale
-        self.animations = AnimationManager(sprite_sheets, 50, 4)
-        self.animations.register_animation("idle",
-                                           [0, 1, 2, 3, 4],
-                                           "enemy_idle"
-                                           )
-        self.animations.activate_animation("idle", 0.1, True)
-    
-    def take_damage(self, damage: int): 
-        self.health -= damage
-        # This is entirely for debugging purposes
-        print(self.health)
+# Creates an enemy as an entity in an ECS world: 30 health by default, a
+# 200x200 collider and the idle animation looping.
+def spawn_enemy(world: ecs.World, sprite_sheets: dict, x, y, health=30) -> int:
+    animation_set = get_animation_set(sprite_sheets, 50, 4, register_animations)
 
-    def update(self, dt):
-        self.animations.update(dt)
+    enemy = world.create_entity()
+    world.add_position(enemy, x, y)
+    world.add_velocity(enemy)
+    world.add_animation(enemy, animation_set.animations["idle"], 0.1, True)
+    world.add_health(enemy, health)
+    world.add_collider(enemy, 200, 200)
+    world.add_chase(enemy, 100)
 
-    def render(self, screen: pygame.Surface, camera_adjustment: tuple):
-        screen.blit(
-            self.animations.get_current_sprite(),
-            (
-                self.x + camera_adjustment[0],
-                self.y + camera_adjustment[1]
-            )
-        )
+    return enemy
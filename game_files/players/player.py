@@ -1,60 +1,94 @@
+import math
+
 import pygame
 
-from game_files.animations.animation_manager import AnimationManager
-from game_files.config import map_width, map_height
+from game_files.animations.animation_manager import AnimationManager, AnimationSet
+from game_files.animations.animation_manager import get_animation_set
+
+
+def register_animations(animations: AnimationSet):
+    # Walking animations
+    animations.register_animation("walking_right", [3, 7, 11, 15], "walking_animations")
+    animations.register_animation("walking_left", [2, 6, 10, 14], "walking_animations")
+    animations.register_animation("walking_up", [1, 5, 9, 13], "walking_animations")
+    animations.register_animation("walking_down", [0, 4, 8, 12], "walking_animations")
+
+    # Stationary sprites
+    animations.register_animation("stationary_down", [0, 0, 0], "walking_animations")
+    animations.register_animation("stationary_up", [1, 1, 1], "walking_animations")
+    animations.register_animation("stationary_left", [2, 2, 2], "walking_animations")
+    animations.register_animation("stationary_right", [3, 3, 3], "walking_animations")
+
+    # Attacks
+    animations.register_animation("attack_down", [0, 0, 0], "attack_animation")
+    animations.register_animation("attack_up", [1, 1, 1], "attack_animation")
+    animations.register_animation("attack_left", [2, 2, 2], "attack_animation")
+    animations.register_animation("attack_right", [3, 3, 3], "attack_animation")
 
 
 class Player:
     def __init__(self, sprite_sheets: dict, x, y):
         self.x = x
         self.y = y
+        # Position as of the tick before, for blending between ticks
+        self.previous_x = x
+        self.previous_y = y
         self.velocity = 250
         self.direction = "down"
         self.moving = False
         # Character sheet, pixel count, and scale factor
-        self.animations = AnimationManager(sprite_sheets, 16, 4)
+        self.animations = AnimationManager(
+            get_animation_set(sprite_sheets, 16, 4, register_animations)
+        )
         self.health = 100
 
-        # Walking animations
-        self.animations.register_animation("walking_right", [3, 7, 11, 15], "walking_animations")
-        self.animations.register_animation("walking_left", [2, 6, 10, 14], "walking_animations")
-        self.animations.register_animation("walking_up", [1, 5, 9, 13], "walking_animations")
-        self.animations.register_animation("walking_down", [0, 4, 8, 12], "walking_animations")
+        self.animations.activate_animation("stationary_" + self.direction, 0.1, True)
 
-        # Stationary sprites
-        self.animations.register_animation("stationary_down", [0, 0, 0], "walking_animations")
-        self.animations.register_animation("stationary_up", [1, 1, 1], "walking_animations")
-        self.animations.register_animation("stationary_left", [2, 2, 2], "walking_animations")
-        self.animations.register_animation("stationary_right", [3, 3, 3], "walking_animations")
+        # Furthest the player can go right and down, anywhere until
+        # set_bounds is called with the size of the map
+        self.max_x = math.inf
+        self.max_y = math.inf
 
-        # Attacks
-        self.animations.register_animation("attack_down", [0, 0, 0], "attack_animation")
-        self.animations.register_animation("attack_up", [1, 1, 1], "attack_animation")
-        self.animations.register_animation("attack_left", [2, 2, 2], "attack_animation")
-        self.animations.register_animation("attack_right", [3, 3, 3], "attack_animation")
+        # Solid tiles are collided with by the player's feet, the bottom
+        # middle of the sprite, as x, y, width and height from the sprite's
+        # top left. No collider means nothing is solid.
+        self.collider = None
+        self.hitbox = (16, 40, 32, 24)
 
-    def move(self, dt):
-        self.height = 4
-        self.width = 16
-
-        # Prevent the player from leaving the set map. This only works if the map size never changes
-        if self.y < 0:
-            self.y = 0
-        elif self.x < 0:
-            self.x = 0
-        elif self.y > map_height - self.height:
-            self.y = map_height - self.height
-        elif self.x > map_width - self.width:
-            self.x = map_width - self.width
+    # Keep the player's sprite inside an area of the given size in pixels
+    def set_bounds(self, width, height):
+        sprite = self.animations.get_current_sprite()
+        self.max_x = width - sprite.get_width()
+        self.max_y = height - sprite.get_height()
 
+    # Put the player somewhere new, without blending from where they were
+    def teleport(self, x, y):
+        self.x = self.previous_x = min(max(x, 0), self.max_x)
+        self.y = self.previous_y = min(max(y, 0), self.max_y)
+
+    def move(self, dt):
+        dx = dy = 0
         if self.direction == "up":
-            self.y -= self.velocity * dt
+            dy = -self.velocity * dt
         elif self.direction == "down":
-            self.y += self.velocity * dt
+            dy = self.velocity * dt
         elif self.direction == "left":
-            self.x -= self.velocity * dt
+            dx = -self.velocity * dt
         elif self.direction == "right":
-            self.x += self.velocity * dt
+            dx = self.velocity * dt
+
+        # Stop against solid tiles in the way
+        if self.collider is not None:
+            hitbox_x, hitbox_y, hitbox_width, hitbox_height = self.hitbox
+            x, y, _, _ = self.collider.move(
+                self.x + hitbox_x, self.y + hitbox_y, hitbox_width, hitbox_height, dx, dy
+            )
+            dx = x - hitbox_x - self.x
+            dy = y - hitbox_y - self.y
+
+        # Prevent the player from leaving the map
+        self.x = min(max(self.x + dx, 0), self.max_x)
+        self.y = min(max(self.y + dy, 0), self.max_y)
 
     def attack(self):
         self.animations.activate_animation("attack_" + self.direction, 0.15, False)
@@ -71,13 +105,23 @@ class Player:
         self.animations.activate_animation("stationary_" + self.direction, 0.1, True)
 
     def update(self, dt):
+        self.previous_x = self.x
+        self.previous_y = self.y
+
         if self.moving:
             self.move(dt)
 
         self.animations.update(dt)
 
-    def render(self, screen: pygame.Surface, camera_adjustment: tuple):
-        screen.blit(
+    # The current sprite and where it goes on screen
+    def get_sprite(self, camera_adjustment: tuple, alpha: float = 1) -> tuple:
+        x = self.previous_x + (self.x - self.previous_x) * alpha
+        y = self.previous_y + (self.y - self.previous_y) * alpha
+
+        return (
             self.animations.get_current_sprite(),
-            (self.x + camera_adjustment[0], self.y + camera_adjustment[1]),
+            (x + camera_adjustment[0], y + camera_adjustment[1]),
         )
+
+    def render(self, screen: pygame.Surface, camera_adjustment: tuple, alpha: float = 1):
+        screen.blit(*self.get_sprite(camera_adjustment, alpha))
@@ -0,0 +1,101 @@
+import csv
+import json
+import sys
+import time
+
+from collections import deque
+
+from game_files.config import profiler_enabled
+
+
+# Times sections of each frame and counts things that happen in them. Code
+# is marked with begin(name) and end(name) around a section and count(name)
+# for counters. While the profiler is disabled these return straight away, so
+# the hooks can stay in place.
+class Profiler:
+    def __init__(self, enabled: bool = False, history: int = 600):
+        self.enabled = enabled
+
+        # Finished frames, oldest first. Each is a dict of section and
+        # counter names to seconds and counts.
+        self.frames = deque(maxlen=history)
+        self.frame_number = 0
+
+        self.current = {}
+        self.starts = {}
+        self.frame_start = time.perf_counter()
+        self.allocated_blocks = sys.getallocatedblocks()
+
+    def set_enabled(self, enabled: bool):
+        self.enabled = enabled
+        # Don't count the time spent disabled as part of a frame
+        self.current = {}
+        self.starts = {}
+        self.frame_start = time.perf_counter()
+        self.allocated_blocks = sys.getallocatedblocks()
+
+    def begin(self, name: str):
+        if not self.enabled:
+            return
+        self.starts[name] = time.perf_counter()
+
+    # Sections run more than once in a frame, such as update when several
+    # ticks are due, add up. A section the profiler was turned on in the
+    # middle of is skipped.
+    def end(self, name: str):
+        if not self.enabled:
+            return
+        start = self.starts.pop(name, None)
+        if start is not None:
+            self.current[name] = self.current.get(name, 0) + time.perf_counter() - start
+
+    def count(self, name: str, amount: int = 1):
+        if not self.enabled:
+            return
+        self.current[name] = self.current.get(name, 0) + amount
+
+    def end_frame(self):
+        if not self.enabled:
+            return
+
+        now = time.perf_counter()
+        # Python objects allocated over the frame, less the ones freed
+        allocated_blocks = sys.getallocatedblocks()
+
+        frame = {
+            "frame": self.frame_number,
+            "frame_time": now - self.frame_start,
+            "allocated_blocks": allocated_blocks - self.allocated_blocks,
+        }
+        frame.update(self.current)
+        self.frames.append(frame)
+
+        self.frame_number += 1
+        self.frame_start = now
+        self.allocated_blocks = allocated_blocks
+        self.current = {}
+
+    def get_fps(self, frames: int = 60) -> float:
+        recent = list(self.frames)[-frames:]
+        total = sum(frame["frame_time"] for frame in recent)
+        return len(recent) / total if total else 0
+
+    # Save the recorded frames as a .json or .csv trace, times in seconds
+    def export(self, filename: str):
+        frames = list(self.frames)
+
+        if filename.endswith(".csv"):
+            columns = []
+            for frame in frames:
+                columns.extend(name for name in frame if name not in columns)
+
+            with open(filename, "w", newline="") as trace_file:
+                writer = csv.DictWriter(trace_file, columns, restval=0)
+                writer.writeheader()
+                writer.writerows(frames)
+        else:
+            with open(filename, "w") as trace_file:
+                json.dump(frames, trace_file, indent=1)
+
+
+profiler = Profiler(profiler_enabled)
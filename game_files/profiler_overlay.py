@@ -0,0 +1,69 @@
+import pygame
+
+from game_files.profiler import Profiler
+from game_files.text import get_font, render_text
+
+
+# Draws FPS, a graph of recent frame times and the slowest sections of the
+# last frame in the corner of the screen. The overlay is opaque so it can be
+# drawn over scenes that only redraw what changed.
+class ProfilerOverlay:
+    def __init__(self, profiler: Profiler, width: int = 300, graph_height: int = 60):
+        self.profiler = profiler
+        self.width = width
+        self.graph_height = graph_height
+        self.font = get_font("Arial", 16)
+        self.line_height = self.font.get_linesize()
+
+        # The graph goes up to this many seconds, with a line at the frame
+        # time of 60 FPS
+        self.graph_max = 1 / 20
+        self.target_frame_time = 1 / 60
+
+        self.surface = pygame.Surface((width, graph_height + self.line_height * 8))
+
+    def render(self, screen: pygame.Surface) -> pygame.Rect:
+        surface = self.surface
+        surface.fill((0, 0, 0))
+
+        frames = list(self.profiler.frames)[-self.width:]
+        y = 0
+        surface.blit(
+            render_text(self.font, f"FPS {self.profiler.get_fps():.0f}", "white"), (4, y)
+        )
+        y += self.line_height
+
+        # One column per frame, newest on the right
+        graph_top = y
+        graph_bottom = graph_top + self.graph_height
+        scale = self.graph_height / self.graph_max
+        offset = self.width - len(frames)
+        for index, frame in enumerate(frames):
+            height = min(frame["frame_time"] * scale, self.graph_height)
+            color = (255, 80, 80) if frame["frame_time"] > self.target_frame_time else (80, 255, 80)
+            x = offset + index
+            pygame.draw.line(surface, color, (x, graph_bottom), (x, graph_bottom - height))
+
+        target_y = graph_bottom - self.target_frame_time * scale
+        pygame.draw.line(surface, (255, 255, 255), (0, target_y), (self.width, target_y))
+        y = graph_bottom
+
+        # The slowest sections of the last frame, then its counters
+        if frames:
+            last = frames[-1]
+            sections = sorted(
+                (name for name in last if isinstance(last[name], float) and name != "frame_time"),
+                key=last.get,
+                reverse=True,
+            )
+            counters = [name for name in last if isinstance(last[name], int) and name != "frame"]
+            lines = [f"{name} {last[name] * 1000:.2f}ms" for name in sections[:3]]
+            lines += [f"{name} {last[name]}" for name in counters[:4]]
+
+            for line in lines:
+                surface.blit(render_text(self.font, line, "white"), (4, y))
+                y += self.line_height
+
+        rect = surface.get_rect(topright=(screen.get_width(), 0))
+        screen.blit(surface, rect)
+        return rect
@@ -2,6 +2,12 @@ import pygame
 import random
 import time
 
+from game_files.config import max_fps, profiler_enabled, tick_rate
+from game_files.game_loop import GameLoop
+from game_files.input import InputHandler
+from game_files.profiler import profiler
+from game_files.profiler_overlay import ProfilerOverlay
+
 
 class Entity:
     def __init__(self):
@@ -14,18 +20,41 @@ class Entity:
         pass
 
 
-# Switching between scenes
+# Switching between scenes. Scenes can be given ready made or as functions
+# that build them, which are only called the first time the scene is used.
 class SceneManager:
-    def __init__(self):
+    def __init__(self, tick_rate: int = tick_rate, max_fps: int = max_fps):
         self.scenes = {}
+        self.scene_factories = {}
         self.quit = False
+        self.loop = GameLoop(tick_rate, max_fps)
+        # Input is read once a frame for whichever scene is running
+        self.input = InputHandler()
+
+        # Frame timings drawn over the scene, toggled with F3
+        self.profiler_overlay = None
+        self.show_profiler = False
 
     def initialize(self, scenes: dict, starting_scene: str):
-        self.scenes = scenes
-        self.current_scene = self.scenes[starting_scene]
+        for name, scene in scenes.items():
+            if isinstance(scene, Scene):
+                self.scenes[name] = scene
+            else:
+                self.scene_factories[name] = scene
+
+        self.current_scene = self.build_scene(starting_scene)
+
+    def build_scene(self, name: str):
+        if name not in self.scenes:
+            self.scenes[name] = self.scene_factories.pop(name)()
+        return self.scenes[name]
 
     def set_scene(self, new_scene: str):
-        self.current_scene = self.scenes[new_scene]
+        self.current_scene = self.build_scene(new_scene)
+        # Building a scene can take a while, don't count it as game time
+        self.loop.reset()
+        # Whatever the last scene drew is still on screen
+        self.current_scene.mark_all_dirty()
 
     def get_scene(self):
         return self.current_scene
@@ -33,6 +62,46 @@ class SceneManager:
     def quit_game(self):
         self.quit = True
 
+    # Input any scene responds to the same way
+    def handle_input(self):
+        if "toggle_profiler" in self.input.state.frame_pressed:
+            self.show_profiler = not self.show_profiler
+            profiler.set_enabled(self.show_profiler or profiler_enabled)
+            # Clear the overlay off the screen
+            self.current_scene.mark_all_dirty()
+
+    # Run one frame of the current scene. The simulation is stepped in fixed
+    # ticks and rendering is told how far it is between the last two ticks.
+    def run_frame(self):
+        profiler.begin("poll_events")
+        self.input.poll()
+        self.handle_input()
+        self.current_scene.poll_events()
+        profiler.end("poll_events")
+
+        for _ in range(self.loop.advance()):
+            profiler.begin("update")
+            self.current_scene.update(self.loop.dt)
+            self.input.end_tick()
+            profiler.end("update")
+
+        profiler.begin("render")
+        self.current_scene.render(self.loop.alpha)
+        profiler.end("render")
+
+        if self.show_profiler:
+            self.render_profiler()
+
+        self.loop.wait()
+        profiler.end_frame()
+
+    def render_profiler(self):
+        screen = pygame.display.get_surface()
+        if self.profiler_overlay is None:
+            self.profiler_overlay = ProfilerOverlay(profiler)
+
+        pygame.display.update(self.profiler_overlay.render(screen))
+
 
 # A scene is a collection of objects that are set to be updated and rendered
 # in any given frame. It allows us to quickly switch between, for instance, a
@@ -43,11 +112,39 @@ class Scene:
         self.screen = screen
         self.sprites = sprites
 
-    def update(self):
+        # Areas of the screen that changed since the display was last
+        # updated. Scenes that redraw everything each frame can mark the
+        # whole screen instead.
+        self.dirty_rects = []
+        self.full_redraw = True
+
+    def mark_dirty(self, rect: pygame.Rect):
+        self.dirty_rects.append(pygame.Rect(rect))
+
+    def mark_all_dirty(self):
+        self.full_redraw = True
+
+    # Push the changed areas of the screen to the display
+    def update_display(self):
+        if self.full_redraw:
+            pygame.display.update()
+        elif self.dirty_rects:
+            pygame.display.update(self.dirty_rects)
+
+        self.dirty_rects = []
+        self.full_redraw = False
+
+    # dt is always the fixed tick length of the scene manager's loop.
+    # Gameplay reads the manager's input state here, once per tick.
+    def update(self, dt):
         pass
 
-    def render(self):
+    # alpha is how far between the last tick and the next one this frame is,
+    # from 0 to 1, for blending positions so movement looks smooth
+    def render(self, alpha: float = 1):
         pass
 
+    # Respond to input once per frame, for things that don't need to wait
+    # for a tick such as quitting and redrawing the window
     def poll_events(self):
         pass
@@ -0,0 +1,45 @@
+import pygame
+
+from collections import defaultdict
+
+from game_files.profiler import profiler
+
+# Layers are drawn lowest first. Lighting goes over the world but not the HUD.
+GROUND = 0
+ENTITIES = 1
+LIGHTING = 2
+HUD = 3
+
+# Layers drawn from the top of the screen down, so things lower on screen
+# are drawn over things behind them
+DEPTH_SORTED_LAYERS = {ENTITIES}
+
+
+# Collects everything a scene draws in a frame, then draws it with one
+# Surface.blits call per layer instead of one blit call per sprite
+class RenderQueue:
+    def __init__(self):
+        self.layers = defaultdict(list)
+
+    def submit(self, layer: int, surface: pygame.Surface, position: tuple):
+        self.layers[layer].append((surface, position))
+
+    # sprites is a list of (surface, position), or of (surface, position,
+    # area, special_flags) for sprites blended with the screen
+    def submit_many(self, layer: int, sprites: list):
+        self.layers[layer].extend(sprites)
+
+    def flush(self, screen: pygame.Surface):
+        profiler.begin("render.blits")
+        for layer in sorted(self.layers):
+            sprites = self.layers[layer]
+
+            # Sort by where the bottom of each sprite is
+            if layer in DEPTH_SORTED_LAYERS:
+                sprites.sort(key=lambda sprite: sprite[1][1] + sprite[0].get_height())
+
+            screen.blits(sprites, doreturn=False)
+            profiler.count("blits", len(sprites))
+
+        self.layers.clear()
+        profiler.end("render.blits")
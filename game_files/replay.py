@@ -0,0 +1,109 @@
+import random
+import struct
+import sys
+import zlib
+
+import numpy as np
+
+from game_files.headless import HeadlessRunner, create_scene, format_summary, summarize
+from game_files.input import InputState
+from game_files.scenes.main_scene import MainScene
+
+# Replay file layout
+#
+# header: magic "RPGR", format version, random seed, tick length in seconds,
+#         number of ticks and length of the map path (all little endian),
+#         then the map path as utf-8
+# ticks:  one byte per tick, compressed with zlib. The low 3 bits are the
+#         direction held (0 for none, then 1 + index in DIRECTIONS) and bit 3
+#         is set on ticks where attack was pressed.
+MAGIC = b"RPGR"
+VERSION = 1
+HEADER = struct.Struct("<4sHIdIH")
+
+DIRECTIONS = ("up", "down", "left", "right")
+ATTACK = 1 << 3
+
+
+# Seed every random number generator the game uses, so a replay plays out
+# the same way it was recorded
+def seed_random(seed: int):
+    random.seed(seed)
+    np.random.seed(seed)
+
+
+# Records the input MainScene reads every tick
+class ReplayRecorder:
+    def __init__(self, seed: int, dt: float, map_path: str):
+        self.seed = seed
+        self.dt = dt
+        self.map_path = map_path
+        self.ticks = bytearray()
+
+    def record(self, state: InputState):
+        direction = state.latest_held(DIRECTIONS)
+        tick = DIRECTIONS.index(direction) + 1 if direction is not None else 0
+        if "attack" in state.pressed:
+            tick |= ATTACK
+        self.ticks.append(tick)
+
+    def save(self, filename: str):
+        map_path = self.map_path.encode("utf-8")
+        with open(filename, "wb") as replay_file:
+            replay_file.write(
+                HEADER.pack(MAGIC, VERSION, self.seed, self.dt, len(self.ticks), len(map_path))
+            )
+            replay_file.write(map_path)
+            replay_file.write(zlib.compress(bytes(self.ticks), 9))
+
+
+class Replay:
+    def __init__(self, filename: str):
+        with open(filename, "rb") as replay_file:
+            data = replay_file.read()
+
+        magic, version, seed, dt, tick_count, path_length = HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(filename + " is not a supported replay")
+
+        self.seed = seed
+        self.dt = dt
+        start = HEADER.size
+        self.map_path = data[start:start + path_length].decode("utf-8")
+        self.ticks = zlib.decompress(data[start + path_length:])
+        if len(self.ticks) != tick_count:
+            raise ValueError(filename + " is truncated")
+
+    def __len__(self) -> int:
+        return len(self.ticks)
+
+    # Set the input state to what it was on the given tick
+    def apply(self, state: InputState, tick: int):
+        value = self.ticks[tick]
+        direction = value & (ATTACK - 1)
+
+        state.held = [DIRECTIONS[direction - 1]] if direction else []
+        state.pressed = {"attack"} if value & ATTACK else set()
+
+
+# Builds the scene a replay was recorded in
+def create_replay_scene(replay: Replay) -> MainScene:
+    seed_random(replay.seed)
+    return create_scene(MainScene, map_path=replay.map_path)
+
+
+# Plays a replay back as fast as possible. Without rendering only the
+# simulation runs, for checking gameplay. Returns the per phase timings and
+# the scene as it was at the end.
+def play_replay(filename: str, render: bool = True) -> tuple:
+    replay = Replay(filename)
+    scene = create_replay_scene(replay)
+    timings = HeadlessRunner(scene, replay.dt).run(len(replay), replay=replay, render=render)
+    return timings, scene
+
+
+if __name__ == "__main__":
+    # python -m game_files.replay session.rpgreplay [--no-render]
+    timings, scene = play_replay(sys.argv[1], "--no-render" not in sys.argv)
+    print(format_summary(sys.argv[1], summarize(timings)))
+    print(f"player at {scene.player.x:.1f}, {scene.player.y:.1f}")
@@ -1,34 +1,45 @@
+import math
+
+import numpy as np
 import pygame
-import time
-import json
 
-from game_files.animations.projectile import Projectile
+from game_files.animations.projectile_system import ProjectileSystem
 from game_files.camera import Camera
-from game_files.players.enemy import Enemy
+from game_files.collision import TileCollider, TileCollisionSystem
+from game_files.config import scroll_buffer
+from game_files.ecs import COLLIDER, HEALTH, POSITION
+from game_files.ecs import AnimationSystem, HealthSystem, MovementSystem, RenderSystem, World
+from game_files.pathfinding import ChaseSystem, FlowField, PathfindingService
+from game_files.players.enemy import spawn_enemy
 from game_files.players.player import Player
+from game_files.profiler import profiler
 from game_files.pygame_util import SceneManager, Scene
-from game_files.tiles.tilemap import Tilemap
-from game_files.tiles.tileset import Tileset
+from game_files.render_queue import ENTITIES, GROUND, HUD, LIGHTING, RenderQueue
+from game_files.spatial_hash import SpatialHash
+from game_files.text import GlyphAtlas, get_font, render_text
+from game_files.tiles.scroll_buffer import ScrollBuffer
+from game_files.world_manager import WorldManager
 
 
 class MainScene(Scene):
-    def __init__(self, manager: SceneManager, screen: pygame.Surface, sprites: dict):
+    def __init__(
+        self,
+        manager: SceneManager,
+        screen: pygame.Surface,
+        sprites: dict,
+        map_path: str = "game_files/maps/world.json",
+        world: WorldManager = None,
+    ):
         super().__init__(manager, screen, sprites)
 
-        self.previous_time = None
-
-        # Select which map to load
-        with open("game_files/maps/map.json", "r") as main_map:
-            MAP = json.load(main_map)
-
-        # Where the graphics are location, pixel size, and scale factor
-        self.tileset = Tileset("gfx/rpg_sprites.png", 16, 4)
-        # Create our tilemap
+        # The world is made of areas joined by their edges and doors.
+        # map_path is a world file or a single map, binary .rpgmap maps are
+        # streamed from disk instead of being read whole.
+        self.world_manager = world if world is not None else WorldManager.from_file(map_path)
 
-        self.tilemap = Tilemap(MAP, self.tileset)
-
-        enemy_animations = {"enemy_idle": self.sprites["enemy_idle"]}
-        self.enemy = Enemy(enemy_animations, 500, 500)
+        # Create our tilemap, and work out where enemies can walk
+        self.area = None
+        self.set_area(self.world_manager.start)
 
         player_animations = {
             "walking_animations": self.sprites["player_walk"],
@@ -37,154 +48,361 @@ class MainScene(Scene):
         # Spawn the player with animations and what location
         self.player = Player(player_animations, 100, 100)
 
+        # Enemies are entities in an ECS world, so each system updates all of
+        # them at once
+        self.world = World()
+        # Which of the area's enemies each spawned entity is
+        self.enemy_spawns = {}
+        self.chase_system = ChaseSystem(self.pathfinder, self.player, self.flow_field)
+        self.world.add_system(self.chase_system)
+        self.world.add_system(MovementSystem())
+        self.tile_collision = TileCollisionSystem(self.collider)
+        self.world.add_system(self.tile_collision)
+        self.world.add_system(AnimationSystem())
+        self.world.add_system(HealthSystem())
+        self.render_system = RenderSystem()
+
+        self.enemy_animations = {"enemy_idle": self.sprites["enemy_idle"]}
+        self.enemy_health = 30
+        # Enemies are put in a spatial hash every frame so collisions only
+        # check things that are close to each other
+        self.enemy_hash = SpatialHash()
+
         self.camera = Camera(self.screen, self.player)
 
-        # User input system
+        # User input system. Keys are turned into actions by the scene
+        # manager's input handler.
         self.keybinds = {
             pygame.K_w: "up",
             pygame.K_s: "down",
             pygame.K_a: "left",
             pygame.K_d: "right",
+            pygame.K_SPACE: "attack",
         }
+        self.manager.input.bind(self.keybinds)
+        self.directions = ("up", "down", "left", "right")
+        self.current_direction = None
+
+        # All live projectiles are kept in one pooled system
+        self.projectiles = ProjectileSystem({"projectile": self.sprites["projectile"]})
+        self.projectile_velocity = 500
+        self.projectile_damage = 10
+
+        # Running totals, for balancing runs
+        self.projectiles_fired = 0
+        self.hits = 0
+
+        # Everything drawn in a frame is batched by layer
+        self.render_queue = RenderQueue()
+        # The map is kept drawn between frames and scrolled with the camera
+        self.background = (30, 124, 184)
+        self.scroll_buffer = (
+            ScrollBuffer(self.tilemap, self.screen, background=self.background)
+            if scroll_buffer
+            else None
+        )
 
-        self.keystack = []
-        self.current_key = None
-
-        self.projectiles = []
-
-        self.font = pygame.font.SysFont("Arial", 36)
+        self.font = get_font("Arial", 36)
 
-        # Setup player health 
-        self.health_text = "Health: " + str(self.player.health)
+        # Setup player health. The label never changes and is rendered once,
+        # the number is drawn from pre-rendered digits.
+        self.health_text = "Health: "
         self.health_text_x = 50
         self.health_text_y = 25
-
-    def update(self):
-        if self.previous_time is None:
-            # First run through the loop needs a previous_time value to compute
-            #  delta time to ensure everything is on the same time
-            self.previous_time = time.time()
-        # Delta time
-        current_time = time.time()
-        dt = current_time - self.previous_time
-        self.previous_time = current_time
-
-        self.enemy.update(dt)
+        self.health_digits = GlyphAtlas(self.font, (255, 255, 255))
+
+        # Spawn the player with what location
+        self.enter_area(self.world_manager.start, 100, 100)
+
+    # Switch the map and everything worked out from it to another area
+    def set_area(self, name: str):
+        self.area = self.world_manager.get(name)
+        self.tilemap = self.area.tilemap
+        self.tileset = self.tilemap.tileset
+
+        # Enemies find their way to the player around solid tiles. Near the
+        # player they share one flow field, further away each gets a path.
+        # Both are worked out a bit each tick so they never stall one.
+        self.navigation = self.area.navigation
+        # Fog of war and lights, for dark areas
+        self.lighting = self.area.lighting
+        self.pathfinder = PathfindingService(self.navigation)
+        self.flow_field = FlowField(self.navigation)
+
+        # The player, enemies and projectiles are stopped by the same tiles
+        # enemies path around
+        self.collider = TileCollider(self.navigation)
+
+    # Move the player to x, y in the given area. Enemies and projectiles
+    # stay behind and the new area's enemies that haven't been killed are
+    # spawned.
+    def enter_area(self, name: str, x, y):
+        self.record_cleared_spawns()
+        if name != self.area.area.name:
+            self.set_area(name)
+            self.chase_system.set_pathfinder(self.pathfinder, self.flow_field)
+            self.tile_collision.collider = self.collider
+            if self.scroll_buffer is not None:
+                self.scroll_buffer.set_tilemap(self.tilemap)
+
+        self.world.destroy_entities(self.world.query(POSITION))
+        self.projectiles.kill(self.projectiles.live_indices())
+        self.enemy_spawns = {}
+        for index, (enemy_x, enemy_y) in enumerate(self.area.area.enemies):
+            if index not in self.area.cleared_spawns:
+                self.enemy_spawns[self.spawn_enemy(enemy_x, enemy_y)] = index
+
+        self.player.collider = self.collider
+        self.projectiles.collider = self.collider
+        self.player.set_bounds(
+            self.tilemap.width * self.tilemap.tilesize,
+            self.tilemap.height * self.tilemap.tilesize,
+        )
+        self.player.teleport(x, y)
+        self.camera.snap()
+
+    # Remember which of the current area's enemies have been killed, an
+    # entity spawned for one without health any more has died
+    def record_cleared_spawns(self):
+        for enemy, index in self.enemy_spawns.items():
+            if not self.world.mask[enemy] & HEALTH:
+                self.area.cleared_spawns.add(index)
+
+    # Walking off an edge or onto a door takes the player to another area
+    def check_transitions(self):
+        player = self.player
+        area = self.area.area
+
+        if player.moving:
+            edge = None
+            if player.direction == "left" and player.x <= 0:
+                edge = "left"
+            elif player.direction == "right" and player.x >= player.max_x:
+                edge = "right"
+            elif player.direction == "up" and player.y <= 0:
+                edge = "up"
+            elif player.direction == "down" and player.y >= player.max_y:
+                edge = "down"
+
+            # Come in on the opposite edge of the next area, the player is
+            # kept inside it by enter_area
+            if edge in area.edges:
+                neighbour = self.world_manager.get(area.edges[edge])
+                width = neighbour.tilemap.width * neighbour.tilemap.tilesize
+                height = neighbour.tilemap.height * neighbour.tilemap.tilesize
+                x = {"left": width, "right": 0}.get(edge, player.x)
+                y = {"up": height, "down": 0}.get(edge, player.y)
+                self.enter_area(area.edges[edge], x, y)
+                return
+
+        tilesize = self.tilemap.tilesize
+        tile_x = int((player.x + tilesize / 2) // tilesize)
+        tile_y = int((player.y + tilesize / 2) // tilesize)
+        for door in area.doors:
+            if door.x == tile_x and door.y == tile_y:
+                tilesize = self.world_manager.areas[door.to].tilesize
+                self.enter_area(door.to, door.to_x * tilesize, door.to_y * tilesize)
+                return
+
+    def update(self, dt):
+        self.handle_input()
+        self.tilemap.update(dt)
         self.player.update(dt)
 
-        max_distance = 250
-        # If projectiles have moved further than the max distance then they are removed from the list
-        self.projectiles = [
-            p for p in self.projectiles if not p.has_traveled_too_far(max_distance)
-        ]
-        for projectile in self.projectiles:
-            projectile.update(dt)
+        # Load the areas the player is near before they get there
+        self.check_transitions()
+        self.world_manager.update(self.area, self.player.x, self.player.y)
 
-        self.camera.update(dt)
+        # Projectiles that have moved further than the max distance are removed
+        self.projectiles.update(dt)
 
-    def render(self):
-        # Clear screen
-        self.screen.fill((30, 124, 184))
-
-        # Go through our map and render the map
-        for y in self.tilemap.map:
-            for x in y:
-                self.screen.blit(
-                    x.sprite,
-                    (
-                        x.x + self.camera.get_camera_adjustments()[0],
-                        x.y + self.camera.get_camera_adjustments()[1],
-                    ),
-                )
+        self.collision_check()
 
-        # Load health bar
-        self.screen.blit(
-            self.font.render(self.health_text, True, (255, 255, 255)),
-            (self.health_text_x, self.health_text_y),
-        )
+        # Move and animate enemies, and remove the ones that have died
+        self.pathfinder.update()
+        self.flow_field.update()
+        self.world.update(dt)
 
-        # Load enemy
-        self.enemy.render(self.screen, self.camera.get_camera_adjustments())
+        self.camera.update(dt)
 
-        # Load player
-        self.player.render(self.screen, self.camera.get_camera_adjustments())
+    def render(self, alpha: float = 1):
+        # Where the camera is between the last two ticks
+        camera_adjustment = self.camera.get_camera_adjustments(alpha)
+
+        screen_size = self.screen.get_size()
+        queue = self.render_queue
+
+        # Render the part of the map that is on screen. The scroll buffer
+        # covers the whole screen, so it doesn't need clearing first.
+        profiler.begin("render.tiles")
+        if self.scroll_buffer is not None:
+            tile_adjustment = (
+                math.floor(camera_adjustment[0]),
+                math.floor(camera_adjustment[1]),
+            )
+            self.scroll_buffer.render(self.screen, tile_adjustment)
+        else:
+            tile_adjustment = camera_adjustment
+            self.screen.fill(self.background)
+            queue.submit_many(
+                GROUND, self.tilemap.get_visible_chunks(tile_adjustment, screen_size)
+            )
+        queue.submit_many(
+            GROUND, self.tilemap.get_visible_animated_tiles(tile_adjustment, screen_size)
+        )
+        profiler.end("render.tiles")
+
+        # Load enemies, the player and projectiles. They are drawn in order of
+        # how far down the screen they are.
+        profiler.begin("render.entities")
+        queue.submit_many(
+            ENTITIES,
+            self.render_system.get_sprites(self.world, screen_size, camera_adjustment, alpha),
+        )
+        queue.submit(ENTITIES, *self.player.get_sprite(camera_adjustment, alpha))
+        profiler.end("render.entities")
 
-        # Load projectiles
-        for projectile in self.projectiles:
-            projectile.render(self.screen, self.camera.get_camera_adjustments())
+        profiler.begin("render.projectiles")
+        queue.submit_many(
+            ENTITIES, self.projectiles.get_sprites(screen_size, camera_adjustment, alpha)
+        )
+        profiler.end("render.projectiles")
+        profiler.count("live_projectiles", self.projectiles.count)
+
+        # Darken everything but the HUD in dark areas
+        if self.lighting is not None:
+            profiler.begin("render.lighting")
+            light, position = self.lighting.get_sprite(
+                screen_size,
+                (math.floor(camera_adjustment[0]), math.floor(camera_adjustment[1])),
+                self.navigation.tile_at(
+                    self.player.x + self.tilemap.tilesize / 2,
+                    self.player.y + self.tilemap.tilesize / 2,
+                ),
+                self.get_lights(),
+            )
+            queue.submit_many(LIGHTING, [(light, position, None, pygame.BLEND_MULT)])
+            profiler.end("render.lighting")
 
-        # Update display
-        pygame.display.update()
+        # Load health bar
+        health_label = render_text(self.font, self.health_text, (255, 255, 255))
+        queue.submit(HUD, health_label, (self.health_text_x, self.health_text_y))
+        queue.submit_many(
+            HUD,
+            self.health_digits.get_glyphs(
+                str(self.player.health),
+                (self.health_text_x + health_label.get_width(), self.health_text_y),
+            ),
+        )
 
-    def collision_check(self, projectile, enemy):
-        # Check if projectile is colliding with the enemy
-        return (
-            projectile.x < self.enemy.x + self.enemy.width and
-            projectile.x + projectile.width >= self.enemy.x and
-            projectile.y < self.enemy.y + enemy.height and
-            projectile.y + projectile.height >= self.enemy.y
+        queue.flush(self.screen)
+
+        # The camera moves the whole world, so the whole screen is updated
+        self.mark_all_dirty()
+        self.update_display()
+
+    # Lights that move, the player's torch then the projectiles closest to
+    # the player, as many as the lighting draws a frame
+    def get_lights(self) -> list:
+        tilesize = self.tilemap.tilesize
+        player_x = self.player.x + tilesize / 2
+        player_y = self.player.y + tilesize / 2
+        torch_radius, torch_color = self.lighting.torch
+        lights = [(player_x, player_y, int(torch_radius * tilesize), tuple(torch_color))]
+
+        live = self.projectiles.live_indices()
+        if len(live) > 0:
+            x = self.projectiles.x[live] + self.projectiles.width / 2
+            y = self.projectiles.y[live] + self.projectiles.height / 2
+            closest = np.argsort((x - player_x) ** 2 + (y - player_y) ** 2)
+            closest = closest[:self.lighting.max_dynamic_lights - 1]
+            lights.extend(
+                (light_x, light_y, tilesize, (255, 160, 60))
+                for light_x, light_y in zip(x[closest].tolist(), y[closest].tolist())
+            )
+
+        return lights
+
+    def spawn_enemy(self, x, y) -> int:
+        enemy = spawn_enemy(self.world, self.enemy_animations, x, y, self.enemy_health)
+        # Reusing a spawned enemy's entity means that enemy died
+        if enemy in self.enemy_spawns:
+            self.area.cleared_spawns.add(self.enemy_spawns.pop(enemy))
+        return enemy
+
+    def collision_check(self):
+        world = self.world
+
+        self.enemy_hash.clear()
+        enemies = world.query(POSITION | COLLIDER | HEALTH)
+        for enemy, x, y, width, height in zip(
+            enemies.tolist(),
+            world.x[enemies].tolist(),
+            world.y[enemies].tolist(),
+            world.width[enemies].tolist(),
+            world.height[enemies].tolist(),
+        ):
+            self.enemy_hash.insert(enemy, x, y, width, height)
+
+        # if a projectile hits an enemy, then the enemy takes damage
+        live = self.projectiles.live_indices()
+        hits = self.enemy_hash.collisions_for_arrays(
+            live,
+            self.projectiles.x[live],
+            self.projectiles.y[live],
+            self.projectiles.width,
+            self.projectiles.height,
         )
 
+        # A projectile can overlap more than one enemy but only hits one
+        hit_projectiles = set()
+        for index, enemy in hits:
+            if index not in hit_projectiles:
+                hit_projectiles.add(index)
+                world.health[enemy] -= self.projectiles.damage[index]
+
+        if hit_projectiles:
+            self.projectiles.kill(np.fromiter(hit_projectiles, np.intp))
+            self.hits += len(hit_projectiles)
+
+    def handle_input(self):
+        state = self.manager.input.state
+
+        # Attack controls
+        if "attack" in state.pressed:
+            self.player.attack()
+            if self.player.direction == "up":
+                x, y = self.player.x + 16, self.player.y - 16
+            elif self.player.direction == "down":
+                x, y = self.player.x + 16, self.player.y + 50
+            elif self.player.direction == "left":
+                x, y = self.player.x - 16, self.player.y + 16
+            elif self.player.direction == "right":
+                x, y = self.player.x + 50, self.player.y + 16
+            self.projectiles.spawn(
+                x,
+                y,
+                self.player.direction,
+                velocity=self.projectile_velocity,
+                damage=self.projectile_damage,
+            )
+            self.projectiles_fired += 1
+
+        # The player walks the way of the last direction key pressed that is
+        # still held down
+        direction = state.latest_held(self.directions)
+        if direction is not None:
+            if self.current_direction != direction:
+                self.current_direction = direction
+
+                self.player.set_direction(direction)
+                self.player.start_moving("walking_" + direction)
+
+        # If no direction is held, then player stops moving
+        elif self.current_direction is not None:
+            self.current_direction = None
+            self.player.stop_moving()
+
     def poll_events(self):
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:  # If the user closes the window
-                self.manager.quit_game()
-
-            # Attack controls
-            if event.type == pygame.KEYDOWN and event.key == pygame.K_SPACE:
-                self.player.attack()
-                if self.player.direction == "up":
-                    projectile = Projectile(
-                        {"projectile": self.sprites["projectile"]},
-                        self.player.x + 16,
-                        self.player.y - 16,
-                    )
-                elif self.player.direction == "down":
-                    projectile = Projectile(
-                        {"projectile": self.sprites["projectile"]},
-                        self.player.x + 16,
-                        self.player.y + 50,
-                    )
-                elif self.player.direction == "left":
-                    projectile = Projectile(
-                        {"projectile": self.sprites["projectile"]},
-                        self.player.x - 16,
-                        self.player.y + 16,
-                    )
-                elif self.player.direction == "right":
-                    projectile = Projectile(
-                        {"projectile": self.sprites["projectile"]},
-                        self.player.x + 50,
-                        self.player.y + 16,
-                    )
-                projectile.set_direction(self.player.direction)
-                self.projectiles.append(projectile)
-
-            if event.type == pygame.KEYDOWN and event.key in self.keybinds:
-                self.keystack.append(event.key)
-
-            if event.type == pygame.KEYUP and event.key in self.keybinds:
-                self.keystack.remove(event.key)
-
-            # if a projectile hits the enemy, then the enemy takes damage
-            projectiles_to_remove = []
-            for projectile in self.projectiles:
-                if self.collision_check(projectile, self.enemy):
-                    self.enemy.take_damage(projectile.damage)
-                    projectiles_to_remove.append(projectile)
-            
-            for projectile in projectiles_to_remove:
-                self.projectiles.remove(projectile)
-
-            # If keystack has keys inside it
-            if len(self.keystack) > 0:
-                if self.current_key != self.keystack[-1]:
-                    self.current_key = self.keystack[-1]
-
-                    self.player.set_direction(self.keybinds[self.current_key])
-                    self.player.start_moving("walking_" + self.keybinds[event.key])
-
-            # If keystack is empty, then player stops moving
-            if len(self.keystack) == 0:
-                self.current_key = None
-                self.player.stop_moving()
+        if self.manager.input.state.quit:  # If the user closes the window
+            self.manager.quit_game()
@@ -1,6 +1,6 @@
 import pygame
-import time
 
+from game_files.assets import AssetLoader
 from game_files.button import Button
 
 from game_files.pygame_util import SceneManager
@@ -11,10 +11,13 @@ class MenuScene(Scene):
     def __init__(self,
                  manager: SceneManager,
                  screen: pygame.Surface,
-                 sprites: dict):
+                 sprites: dict,
+                 loader: AssetLoader = None):
         super().__init__(manager, screen, sprites)
 
-        self.previous_time = None
+        # Assets the game is still loading, the game can't start until
+        # they are done
+        self.loader = loader
 
         # Create buttons
         self.quit_button = Button(500, 400, "Quit Game")
@@ -25,21 +28,23 @@ class MenuScene(Scene):
             self.manager.quit = True
 
         def start_button():
-            self.manager.set_scene("main")
+            if self.loader is None or self.loader.done:
+                self.manager.set_scene("main")
 
         self.quit_button.register_event(quit_button)
         self.start_button.register_event(start_button)
 
         self.buttons = [self.quit_button, self.start_button]
+        self.update_loading_text()
 
-    def update(self):
-        if self.previous_time is None:
-            self.previous_time = time.time()
+    def update_loading_text(self):
+        if self.loader is not None and not self.loader.done:
+            self.start_button.set_text(f"Loading {self.loader.progress:.0%}")
+        else:
+            self.start_button.set_text("Start Game")
 
-        # Delta time
-        now = time.time()
-        dt = now - self.previous_time
-        self.previous_time = now
+    def update(self, dt):
+        self.update_loading_text()
 
         # Get mouse position
         mouse_x, mouse_y = pygame.mouse.get_pos()
@@ -56,22 +61,36 @@ class MenuScene(Scene):
         self.quit_button.update(dt)
         self.start_button.update(dt)
 
-    def render(self):
-        self.screen.fill("black")
+    def render(self, alpha: float = 1):
+        if self.full_redraw:
+            self.screen.fill("black")
 
-        self.quit_button.render(self.screen)
-        self.start_button.render(self.screen)
+            self.quit_button.render(self.screen)
+            self.start_button.render(self.screen)
+        else:
+            # Only redraw the buttons that changed
+            for button in self.buttons:
+                if button.dirty:
+                    dirty_rect = button.dirty_rect
+                    self.screen.fill("black", dirty_rect)
+                    button.render(self.screen)
+                    self.mark_dirty(dirty_rect)
 
-        pygame.display.update()
+        self.update_display()
 
     def poll_events(self):
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                self.manager.quit_game()
-
-            # Mouse detection
-            # If the mouse left clicks on a button
-            if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+        state = self.manager.input.state
+        if state.quit:
+            self.manager.quit_game()
+
+        # The window was covered or resized, so redraw all of it
+        if state.redraw:
+            self.mark_all_dirty()
+
+        # Mouse detection
+        # If the mouse left clicks on a button
+        for mouse_button, position in state.clicks:
+            if mouse_button == 1:
                 for button in self.buttons:
                     if button.hovered:
                         button.event()
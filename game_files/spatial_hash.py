@@ -0,0 +1,117 @@
+import math
+import numpy as np
+
+from collections import defaultdict
+
+
+# Check if two boxes given as (x, y, width, height) overlap
+def overlaps(a: tuple, b: tuple) -> bool:
+    return (
+        a[0] < b[0] + b[2] and
+        a[0] + a[2] >= b[0] and
+        a[1] < b[1] + b[3] and
+        a[1] + a[3] >= b[1]
+    )
+
+
+# Uniform grid broad phase. Things register the box they cover and are stored
+# in every cell the box touches, so looking for things near a box only looks
+# at a few cells instead of at everything in the scene. The hash is cleared
+# and refilled every frame.
+class SpatialHash:
+    def __init__(self, cell_size: int = 256):
+        self.cell_size = cell_size
+        self.cells = defaultdict(list)
+        self.bounds = {}
+
+    def clear(self):
+        self.cells.clear()
+        self.bounds.clear()
+
+    def cell_range(self, x, y, width, height) -> tuple:
+        return (
+            math.floor(x / self.cell_size),
+            math.floor(y / self.cell_size),
+            math.floor((x + width) / self.cell_size),
+            math.floor((y + height) / self.cell_size),
+        )
+
+    def insert(self, item, x, y, width, height):
+        self.bounds[item] = (x, y, width, height)
+
+        first_x, first_y, last_x, last_y = self.cell_range(x, y, width, height)
+        for cell_y in range(first_y, last_y + 1):
+            for cell_x in range(first_x, last_x + 1):
+                self.cells[(cell_x, cell_y)].append(item)
+
+    # Everything sharing a cell with the box. These are only candidates, use
+    # overlaps() against self.bounds to check for an actual collision.
+    def query(self, x, y, width, height) -> set:
+        found = set()
+
+        first_x, first_y, last_x, last_y = self.cell_range(x, y, width, height)
+        for cell_y in range(first_y, last_y + 1):
+            for cell_x in range(first_x, last_x + 1):
+                items = self.cells.get((cell_x, cell_y))
+                if items:
+                    found.update(items)
+
+        return found
+
+    # Pairs of (thing, item in the hash) whose boxes overlap. things is a list
+    # of (thing, x, y, width, height), for example the player.
+    def collisions(self, things) -> list:
+        pairs = []
+        for thing, x, y, width, height in things:
+            box = (x, y, width, height)
+            for item in self.query(x, y, width, height):
+                if overlaps(box, self.bounds[item]):
+                    pairs.append((thing, item))
+
+        return pairs
+
+    # Pairs of (index, item in the hash) whose boxes overlap, for many boxes
+    # of the same size stored in arrays, such as projectiles. Boxes that are
+    # not in an occupied cell are thrown out with array operations first, so
+    # only boxes near something are checked one by one. The boxes must not
+    # be larger than a cell.
+    def collisions_for_arrays(
+        self, indices: np.ndarray, xs: np.ndarray, ys: np.ndarray, width, height
+    ) -> list:
+        if not self.cells or len(indices) == 0:
+            return []
+
+        occupied = np.array(
+            [self.cell_key(cell_x, cell_y) for cell_x, cell_y in self.cells],
+            dtype=np.int64,
+        )
+
+        first_x = np.floor(xs / self.cell_size).astype(np.int64)
+        first_y = np.floor(ys / self.cell_size).astype(np.int64)
+        last_x = np.floor((xs + width) / self.cell_size).astype(np.int64)
+        last_y = np.floor((ys + height) / self.cell_size).astype(np.int64)
+
+        # A box no bigger than a cell touches at most the cells of its corners
+        near = (
+            np.isin(self.cell_key(first_x, first_y), occupied)
+            | np.isin(self.cell_key(last_x, first_y), occupied)
+            | np.isin(self.cell_key(first_x, last_y), occupied)
+            | np.isin(self.cell_key(last_x, last_y), occupied)
+        )
+
+        near = np.flatnonzero(near)
+        return self.collisions(
+            zip(
+                indices[near].tolist(),
+                xs[near].tolist(),
+                ys[near].tolist(),
+                [width] * len(near),
+                [height] * len(near),
+            )
+        )
+
+    @staticmethod
+    def cell_key(cell_x, cell_y):
+        # Packs a cell position into one integer, works on arrays too
+        return cell_x * 0x100000000 + (cell_y & 0xFFFFFFFF)
+
@@ -0,0 +1,92 @@
+import pygame
+
+from collections import OrderedDict
+
+from game_files.profiler import profiler
+
+fonts = {}
+
+
+# Looking up a system font scans every font installed, so each font is only
+# looked up once and then shared
+def get_font(name: str, size: int) -> pygame.font.Font:
+    key = (name, size)
+
+    font = fonts.get(key)
+    if font is None:
+        font = pygame.font.SysFont(name, size)
+        fonts[key] = font
+
+    return font
+
+
+# Rendered strings, least recently used first. Text that is drawn every
+# frame but rarely changes, like labels and buttons, is only rendered once.
+class TextCache:
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self.surfaces = OrderedDict()
+
+    def render(self, font: pygame.font.Font, text: str, color, antialias: bool = True) -> pygame.Surface:
+        # "white" and (255, 255, 255) are the same colour
+        key = (font, text, tuple(pygame.Color(color)), antialias)
+
+        surface = self.surfaces.get(key)
+        if surface is None:
+            surface = font.render(text, antialias, color)
+            profiler.count("surfaces_created")
+            self.surfaces[key] = surface
+            if len(self.surfaces) > self.max_entries:
+                self.surfaces.popitem(last=False)
+        else:
+            self.surfaces.move_to_end(key)
+
+        return surface
+
+    def clear(self):
+        self.surfaces.clear()
+
+
+text_cache = TextCache()
+
+
+def render_text(font: pygame.font.Font, text: str, color) -> pygame.Surface:
+    return text_cache.render(font, text, color)
+
+
+# Every character of a font rendered once in one colour. Text that changes
+# all the time, like health and damage numbers, is drawn by blitting the
+# characters side by side instead of rendering a new surface every change.
+class GlyphAtlas:
+    def __init__(self, font: pygame.font.Font, color, characters: str = "0123456789-+ "):
+        self.font = font
+        self.color = color
+        self.glyphs = {
+            character: font.render(character, True, color) for character in characters
+        }
+
+    def get_glyph(self, character: str) -> pygame.Surface:
+        glyph = self.glyphs.get(character)
+        if glyph is None:
+            glyph = self.font.render(character, True, self.color)
+            self.glyphs[character] = glyph
+        return glyph
+
+    def get_width(self, text: str) -> int:
+        return sum(self.get_glyph(character).get_width() for character in text)
+
+    # The (glyph, position) of each character of the text
+    def get_glyphs(self, text: str, position: tuple) -> list:
+        x, y = position
+
+        glyphs = []
+        for character in text:
+            glyph = self.get_glyph(character)
+            glyphs.append((glyph, (x, y)))
+            x += glyph.get_width()
+
+        return glyphs
+
+    def render(self, screen: pygame.Surface, text: str, position: tuple) -> pygame.Rect:
+        screen.blits(self.get_glyphs(text, position), doreturn=False)
+        return pygame.Rect(position, (self.get_width(text), self.font.get_height()))
@@ -0,0 +1,170 @@
+import ast
+import json
+import mmap
+import struct
+import sys
+
+from array import array
+from collections import OrderedDict
+
+from game_files.tiles.tile_layer import EMPTY_TILE
+
+# Binary map layout
+#
+# header:  magic "RPGM", format version, region size in tiles,
+#          map width and height in tiles (all little endian)
+# regions: one block per square region of region_size x region_size tile
+#          ids stored as little endian unsigned shorts. Regions are written
+#          row by row and every block is the same size, so the position of
+#          any region in the file can be computed without an index.
+MAGIC = b"RPGM"
+VERSION = 1
+HEADER = struct.Struct("<4sHHII")
+
+
+def read_map_spec(filename: str) -> list[list]:
+    # JSON maps are a plain list of lists. map.txt style files hold a Python
+    # assignment like "MAP = [[...], ...]".
+    with open(filename, "r") as map_file:
+        text = map_file.read()
+
+    if filename.endswith(".json"):
+        return json.loads(text)
+
+    return ast.literal_eval(text.split("=", 1)[1].strip())
+
+
+def convert_map(source: str, destination: str, region_size: int = 16):
+    map_spec = read_map_spec(source)
+
+    height = len(map_spec)
+    width = max((len(row) for row in map_spec), default=0)
+    regions_wide = -(-width // region_size)
+    regions_high = -(-height // region_size)
+
+    with open(destination, "wb") as map_file:
+        map_file.write(HEADER.pack(MAGIC, VERSION, region_size, width, height))
+
+        for region_y in range(regions_high):
+            for region_x in range(regions_wide):
+                region = array("H")
+                for y in range(region_y * region_size, (region_y + 1) * region_size):
+                    row = map_spec[y] if y < height else []
+                    for x in range(region_x * region_size, (region_x + 1) * region_size):
+                        region.append(row[x] if x < len(row) else EMPTY_TILE)
+
+                if sys.byteorder == "big":
+                    region.byteswap()
+                map_file.write(region.tobytes())
+
+
+def load_map(filename: str):
+    # Binary maps are streamed from disk, anything else is read whole
+    if filename.endswith(".rpgmap"):
+        return PagedMap(filename)
+
+    return read_map_spec(filename)
+
+
+class PagedMap:
+    # A tile layer that reads a binary map through a memory map. Regions are
+    # only decoded when a tile inside them is asked for, and at most
+    # max_resident_regions are kept, dropping the least recently used first.
+    # Has the same interface as TileLayer so Tilemap can use either.
+    def __init__(self, filename: str, max_resident_regions: int = 256):
+        self.filename = filename
+        self.file = open(filename, "rb")
+        self.mmap = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, region_size, width, height = HEADER.unpack_from(self.mmap, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(filename + " is not a supported binary map")
+
+        self.region_size = region_size
+        self.region_bytes = region_size * region_size * 2
+        self.width = width
+        self.height = height
+        self.regions_wide = -(-width // region_size)
+
+        self.regions = OrderedDict()
+        self.max_resident_regions = max_resident_regions
+        # Regions that have been changed at runtime. These are never evicted
+        # since the file on disk does not have the changes.
+        self.edited_regions = {}
+
+    def close(self):
+        self.regions.clear()
+        self.mmap.close()
+        self.file.close()
+
+    def decode_region(self, region_x: int, region_y: int) -> array:
+        offset = HEADER.size + (region_y * self.regions_wide + region_x) * self.region_bytes
+
+        region = array("H")
+        region.frombytes(self.mmap[offset:offset + self.region_bytes])
+        if sys.byteorder == "big":
+            region.byteswap()
+        return region
+
+    def get_region(self, region_x: int, region_y: int) -> array:
+        key = (region_x, region_y)
+
+        region = self.edited_regions.get(key)
+        if region is not None:
+            return region
+
+        region = self.regions.get(key)
+        if region is None:
+            region = self.decode_region(region_x, region_y)
+            self.regions[key] = region
+            if len(self.regions) > self.max_resident_regions:
+                self.regions.popitem(last=False)
+        else:
+            self.regions.move_to_end(key)
+
+        return region
+
+    def in_bounds(self, x: int, y: int) -> bool:
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def get(self, x: int, y: int) -> int:
+        size = self.region_size
+        region = self.get_region(x // size, y // size)
+        return region[(y % size) * size + x % size]
+
+    def set(self, x: int, y: int, tile_id: int):
+        size = self.region_size
+        key = (x // size, y // size)
+
+        if key not in self.edited_regions:
+            self.edited_regions[key] = self.get_region(*key)
+            self.regions.pop(key, None)
+
+        self.edited_regions[key][(y % size) * size + x % size] = tile_id
+
+    def get_row(self, y: int, first_x: int = 0, last_x: int = None) -> array:
+        if last_x is None:
+            last_x = self.width
+
+        size = self.region_size
+        row_start = (y % size) * size
+
+        row = array("H")
+        x = first_x
+        while x < last_x:
+            region = self.get_region(x // size, y // size)
+            start = x % size
+            end = min(size, start + last_x - x)
+            row.extend(region[row_start + start:row_start + end])
+            x += end - start
+
+        return row
+
+    # Bytes of tile ids decoded into memory, the rest stays in the file
+    def get_memory_size(self) -> int:
+        return (len(self.regions) + len(self.edited_regions)) * self.region_bytes
+
+
+if __name__ == "__main__":
+    # python -m game_files.tiles.paged_map game_files/maps/map.json map.rpgmap
+    convert_map(sys.argv[1], sys.argv[2])
@@ -0,0 +1,127 @@
+import pygame
+
+from game_files.profiler import profiler
+from game_files.tiles.tilemap import Tilemap
+
+
+# Keeps the map drawn in a surface a margin bigger than the screen on each
+# side, so most frames it only needs to be copied to the screen. When the
+# camera moves past the margin the buffer is shifted with Surface.scroll and
+# only the strips of tiles that come into it are drawn, so the cost follows
+# how fast the camera moves rather than the size of the screen. Edited tiles
+# only have their own cell redrawn. Animated tiles still need drawing on top
+# each frame.
+class ScrollBuffer:
+    def __init__(
+        self,
+        tilemap: Tilemap,
+        screen: pygame.Surface,
+        margin: int = None,
+        background: tuple = (30, 124, 184),
+    ):
+        self.tilemap = tilemap
+        self.view_width, self.view_height = screen.get_size()
+        self.margin = margin if margin is not None else tilemap.tilesize
+        self.background = background
+
+        # Same pixel format as the screen, so copying it over is quick
+        self.surface = pygame.Surface(
+            (self.view_width + self.margin * 2, self.view_height + self.margin * 2), 0, screen
+        )
+        self.width, self.height = self.surface.get_size()
+
+        # Where the buffer's top left is in the world, None until it is drawn
+        self.origin = None
+        # Tiles edited since the buffer was last drawn
+        self.edited = set()
+        tilemap.add_edit_listener(self.on_tile_changed)
+
+    # Draw a different map, all of it is redrawn next frame
+    def set_tilemap(self, tilemap: Tilemap):
+        self.tilemap = tilemap
+        self.origin = None
+        self.edited.clear()
+        if self.on_tile_changed not in tilemap.edit_listeners:
+            tilemap.add_edit_listener(self.on_tile_changed)
+
+    def on_tile_changed(self, x: int, y: int, tile_id: int):
+        self.edited.add((x, y))
+
+    # Fill an area of the buffer, in buffer pixels, with the tiles behind it
+    def draw_area(self, x: int, y: int, width: int, height: int):
+        if width <= 0 or height <= 0:
+            return
+
+        area = pygame.Rect(x, y, width, height)
+        self.surface.fill(self.background, area)
+
+        origin_x, origin_y = self.origin
+        chunks = self.tilemap.get_visible_chunks((-origin_x - x, -origin_y - y), (width, height))
+        self.surface.set_clip(area)
+        self.surface.blits(
+            [(chunk, (chunk_x + x, chunk_y + y)) for chunk, (chunk_x, chunk_y) in chunks],
+            doreturn=False,
+        )
+        self.surface.set_clip(None)
+
+        profiler.count("background_pixels", width * height)
+
+    # Redraw the cells of edited tiles that are in the buffer
+    def draw_edited(self):
+        tilesize = self.tilemap.tilesize
+        origin_x, origin_y = self.origin
+        bounds = pygame.Rect(0, 0, self.width, self.height)
+        for x, y in self.edited:
+            self.draw_area(
+                *bounds.clip(x * tilesize - origin_x, y * tilesize - origin_y, tilesize, tilesize)
+            )
+        self.edited.clear()
+
+    # Move the buffer's top left to a new place in the world
+    def scroll_to(self, origin_x: int, origin_y: int):
+        if self.origin is None:
+            self.origin = (origin_x, origin_y)
+            self.edited.clear()
+            self.draw_area(0, 0, self.width, self.height)
+            return
+
+        # Keep what is still in the buffer and draw what comes in at the sides
+        shift_x = self.origin[0] - origin_x
+        shift_y = self.origin[1] - origin_y
+        self.origin = (origin_x, origin_y)
+        if abs(shift_x) >= self.width or abs(shift_y) >= self.height:
+            self.draw_area(0, 0, self.width, self.height)
+            return
+
+        self.surface.scroll(shift_x, shift_y)
+        if shift_x > 0:
+            self.draw_area(0, 0, shift_x, self.height)
+        elif shift_x < 0:
+            self.draw_area(self.width + shift_x, 0, -shift_x, self.height)
+        if shift_y > 0:
+            self.draw_area(0, 0, self.width, shift_y)
+        elif shift_y < 0:
+            self.draw_area(0, self.height + shift_y, self.width, -shift_y)
+
+    # Draw the map to the screen. camera_adjustment is in whole pixels, so
+    # the buffer lines up with tiles drawn over it.
+    def render(self, screen: pygame.Surface, camera_adjustment: tuple):
+        view_x = -camera_adjustment[0]
+        view_y = -camera_adjustment[1]
+
+        if self.edited and self.origin is not None:
+            self.draw_edited()
+
+        # Recentre on the view once it reaches the edge of the margin
+        if (
+            self.origin is None
+            or not 0 <= view_x - self.origin[0] <= self.margin * 2
+            or not 0 <= view_y - self.origin[1] <= self.margin * 2
+        ):
+            self.scroll_to(view_x - self.margin, view_y - self.margin)
+
+        screen.blit(
+            self.surface,
+            (0, 0),
+            (view_x - self.origin[0], view_y - self.origin[1], self.view_width, self.view_height),
+        )
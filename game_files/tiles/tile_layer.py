@@ -0,0 +1,53 @@
+from array import array
+from itertools import chain
+
+# Id stored in cells that have no tile, for example past the end of a row
+# that is shorter than the rest of the map
+EMPTY_TILE = 0xFFFF
+
+
+class TileLayer:
+    # A grid of tile ids stored row by row in one flat array of unsigned
+    # shorts. This takes 2 bytes per cell instead of a Python object per cell.
+    def __init__(self, width: int, height: int, tiles: array = None):
+        self.width = width
+        self.height = height
+
+        if tiles is None:
+            tiles = array("H", [EMPTY_TILE]) * (width * height)
+        self.tiles = tiles
+
+    @classmethod
+    def from_spec(cls, map_spec: list[list]):
+        height = len(map_spec)
+        width = max((len(row) for row in map_spec), default=0)
+
+        # Pad short rows so every row starts at a multiple of the width
+        rows = (
+            row if len(row) == width else list(row) + [EMPTY_TILE] * (width - len(row))
+            for row in map_spec
+        )
+        return cls(width, height, array("H", chain.from_iterable(rows)))
+
+    def in_bounds(self, x: int, y: int) -> bool:
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def get(self, x: int, y: int) -> int:
+        return self.tiles[y * self.width + x]
+
+    def set(self, x: int, y: int, tile_id: int):
+        self.tiles[y * self.width + x] = tile_id
+
+    def get_row(self, y: int, first_x: int = 0, last_x: int = None) -> array:
+        if last_x is None:
+            last_x = self.width
+
+        start = y * self.width
+        return self.tiles[start + first_x:start + last_x]
+
+    def get_memory_size(self) -> int:
+        return len(self.tiles) * self.tiles.itemsize
+
+    # Nothing to release, kept so layers can be closed the same way
+    def close(self):
+        pass
@@ -1,5 +1,12 @@
+import math
 import pygame
 
+from collections import OrderedDict
+
+from game_files.animations.animation_manager import AnimationManager, AnimationSet
+from game_files.profiler import profiler
+from game_files.tiles.paged_map import PagedMap
+from game_files.tiles.tile_layer import EMPTY_TILE, TileLayer
 from game_files.tiles.tileset import Tileset
 
 
@@ -20,25 +27,292 @@ class Tile:
 class Tilemap:
     # list of lists that contain integer tiles that are an ID for a particular
     # tile in a particular slot
-    def __init__(self, map: list[list], tileset: Tileset):
+    def __init__(
+        self,
+        map: list[list] | TileLayer | PagedMap,
+        tileset: Tileset,
+        chunk_size: int = 16,
+        max_cached_chunks: int = 256,
+        animated_tiles: dict = None,
+        prebake: bool = True,
+    ):
         self.tileset = tileset
         self.map_spec = map
-        # Default map is an empty list of lists filled to map specifications
-        self.map = [[]]
         self.tilesize = self.tileset.scaled_size
 
-        # Create map tiles from specifications
-        x_coord = 0
-        y_coord = 0
-        for y in self.map_spec:
-            row = []
-            for x in y:
-                sprite = self.tileset.get_tile_sprite(x)
-                # x = whatever sprite id we are on, on the map.
-                tile = Tile(x_coord, y_coord, sprite, x)
-                row.append(tile)
-                x_coord += self.tilesize
-            # go down one row then reset x to 0 for the next row
-            y_coord += self.tilesize
-            x_coord = 0
-            self.map.append(row)
+        # Tile ids are kept in a compact grid, Tile objects are only created
+        # when something asks for them. Maps streamed from disk are used as
+        # they are.
+        if isinstance(self.map_spec, list):
+            self.layer = TileLayer.from_spec(self.map_spec)
+        else:
+            self.layer = self.map_spec
+
+        # Map size in tiles
+        self.width = self.layer.width
+        self.height = self.layer.height
+
+        # The map is drawn in square chunks of chunk_size tiles. Each chunk is
+        # pre-composited into a single surface so rendering only needs one blit
+        # per chunk on screen instead of one blit per tile in the whole map.
+        self.chunk_size = chunk_size
+        self.chunk_pixels = self.chunk_size * self.tilesize
+        self.chunks_wide = math.ceil(self.width / self.chunk_size)
+        self.chunks_high = math.ceil(self.height / self.chunk_size)
+
+        # Baked chunks, least recently drawn first. Very large maps would not
+        # fit in memory fully baked, so only max_cached_chunks are kept.
+        self.chunks = OrderedDict()
+        self.max_cached_chunks = max_cached_chunks
+
+        # Counts changes to the map, so anything worked out from the tiles
+        # can tell when it is out of date. Listeners are called with the x, y
+        # and new id of every tile that is changed.
+        self.version = 0
+        self.edit_listeners = []
+
+        # Animated tiles are left out of the baked chunks and drawn on top of
+        # them every frame. All tiles with the same id animate together, so
+        # there is one playback per tile id. chunk_animated_tiles holds the
+        # (x, y, tile id) of the animated tiles in each baked chunk.
+        self.tile_animations = AnimationSet({}, self.tileset.tilesize, self.tileset.scale_factor)
+        self.tile_animations.add_tileset("tiles", self.tileset)
+        self.animated_tiles = {}
+        self.chunk_animated_tiles = {}
+        for tile_id, (keyframes, frequency) in (animated_tiles or {}).items():
+            self.register_animated_tile(tile_id, keyframes, frequency)
+
+        # Bake everything up front when the whole map fits in the cache so
+        # there is no hitch the first time an area comes on screen. Without
+        # prebake the chunks can be baked a few at a time with bake_chunks().
+        if prebake:
+            self.bake_chunks()
+
+    def get_tile_id(self, x: int, y: int) -> int:
+        return self.layer.get(x, y)
+
+    def get_tile(self, x: int, y: int) -> Tile:
+        tile_id = self.layer.get(x, y)
+        return Tile(
+            x * self.tilesize,
+            y * self.tilesize,
+            self.tileset.get_tile_sprite(tile_id),
+            tile_id,
+        )
+
+    # Yields each row of the map as a list of Tile objects, built on the fly
+    def rows(self):
+        for y in range(self.height):
+            yield [
+                self.get_tile(x, y)
+                for x in range(self.width)
+                if self.layer.get(x, y) != EMPTY_TILE
+            ]
+
+    # Rows of Tile objects, kept so code that walks the map tile by tile
+    # still works
+    @property
+    def map(self):
+        return self.rows()
+
+    def register_animated_tile(self, tile_id: int, keyframes: list[int], frequency: float):
+        self.tile_animations.register_animation(str(tile_id), keyframes, "tiles")
+
+        playback = AnimationManager(self.tile_animations)
+        playback.activate_animation(str(tile_id), frequency, True)
+        self.animated_tiles[tile_id] = playback
+
+        # Chunks baked before now have the tile drawn into them
+        self.chunks.clear()
+        self.chunk_animated_tiles.clear()
+
+    # Bake up to max_chunks chunks that aren't baked yet, or all of them.
+    # Returns True once there is nothing left to bake. Maps too big to keep
+    # fully baked are left to bake as they come on screen.
+    def bake_chunks(self, max_chunks: int = None) -> bool:
+        if self.chunks_wide * self.chunks_high > self.max_cached_chunks:
+            return True
+
+        for chunk_y in range(self.chunks_high):
+            for chunk_x in range(self.chunks_wide):
+                if (chunk_x, chunk_y) in self.chunks:
+                    continue
+                if max_chunks is not None:
+                    if max_chunks == 0:
+                        return False
+                    max_chunks -= 1
+                self.get_chunk(chunk_x, chunk_y)
+
+        return True
+
+    # Rough bytes used by the baked chunks and the tile ids in memory
+    def get_memory_size(self) -> int:
+        size = self.layer.get_memory_size()
+        for chunk in self.chunks.values():
+            size += chunk.get_width() * chunk.get_height() * chunk.get_bytesize()
+        return size
+
+    # Drop the baked chunks and close the layer, for maps that won't be used
+    # again. Paged maps let go of their file.
+    def close(self):
+        self.chunks.clear()
+        self.chunk_animated_tiles.clear()
+        self.layer.close()
+
+    def add_edit_listener(self, listener):
+        self.edit_listeners.append(listener)
+
+    def update(self, dt):
+        for playback in self.animated_tiles.values():
+            playback.update(dt)
+
+    # Change a tile while the game is running. Only the one tile is redrawn in
+    # its baked chunk, the rest of the map is left alone.
+    def set_tile(self, x: int, y: int, tile_id: int):
+        old_tile_id = self.layer.get(x, y)
+        if old_tile_id == tile_id:
+            return
+
+        self.layer.set(x, y, tile_id)
+        self.version += 1
+        for listener in self.edit_listeners:
+            listener(x, y, tile_id)
+
+        key = (x // self.chunk_size, y // self.chunk_size)
+        chunk = self.chunks.get(key)
+        if chunk is None:
+            # Not baked, it will be drawn with the new tile when it is needed
+            return
+
+        position = (
+            (x % self.chunk_size) * self.tilesize,
+            (y % self.chunk_size) * self.tilesize,
+        )
+        chunk.fill((0, 0, 0, 0), (position, (self.tilesize, self.tilesize)))
+
+        animated = self.chunk_animated_tiles[key]
+        if old_tile_id in self.animated_tiles:
+            animated.remove((x, y, old_tile_id))
+
+        if tile_id in self.animated_tiles:
+            animated.append((x, y, tile_id))
+        elif tile_id != EMPTY_TILE:
+            chunk.blit(self.tileset.get_tile_sprite(tile_id), position)
+
+    def bake_chunk(self, chunk_x: int, chunk_y: int) -> pygame.Surface:
+        first_x = chunk_x * self.chunk_size
+        first_y = chunk_y * self.chunk_size
+        last_x = min(first_x + self.chunk_size, self.width)
+        last_y = min(first_y + self.chunk_size, self.height)
+
+        chunk = pygame.Surface(
+            ((last_x - first_x) * self.tilesize, (last_y - first_y) * self.tilesize),
+            pygame.SRCALPHA,
+        )
+        profiler.count("surfaces_created")
+
+        tiles = []
+        animated = []
+        for y in range(first_y, last_y):
+            row = self.layer.get_row(y, first_x, last_x)
+            for x in range(first_x, last_x):
+                tile_id = row[x - first_x]
+                if tile_id == EMPTY_TILE:
+                    continue
+                if tile_id in self.animated_tiles:
+                    animated.append((x, y, tile_id))
+                    continue
+                tiles.append(
+                    (
+                        self.tileset.get_tile_sprite(tile_id),
+                        ((x - first_x) * self.tilesize, (y - first_y) * self.tilesize),
+                    )
+                )
+        chunk.blits(tiles, doreturn=False)
+        self.chunk_animated_tiles[(chunk_x, chunk_y)] = animated
+
+        return chunk
+
+    def get_chunk(self, chunk_x: int, chunk_y: int) -> pygame.Surface:
+        key = (chunk_x, chunk_y)
+        chunk = self.chunks.get(key)
+
+        if chunk is None:
+            chunk = self.bake_chunk(chunk_x, chunk_y)
+            self.chunks[key] = chunk
+            # Drop the chunk that has gone the longest without being drawn
+            if len(self.chunks) > self.max_cached_chunks:
+                evicted, _ = self.chunks.popitem(last=False)
+                del self.chunk_animated_tiles[evicted]
+        else:
+            self.chunks.move_to_end(key)
+
+        return chunk
+
+    # Range of chunks overlapping the screen, as first and last chunk x and y
+    def get_visible_range(self, camera_adjustment: tuple, view_size: tuple) -> tuple:
+        # Convert the screen area into world coordinates, then into the range
+        # of chunks it overlaps
+        view_x = -camera_adjustment[0]
+        view_y = -camera_adjustment[1]
+
+        return (
+            max(0, math.floor(view_x / self.chunk_pixels)),
+            max(0, math.floor(view_y / self.chunk_pixels)),
+            min(self.chunks_wide - 1, math.floor((view_x + view_size[0]) / self.chunk_pixels)),
+            min(self.chunks_high - 1, math.floor((view_y + view_size[1]) / self.chunk_pixels)),
+        )
+
+    def get_visible_chunks(self, camera_adjustment: tuple, view_size: tuple) -> list:
+        first_x, first_y, last_x, last_y = self.get_visible_range(camera_adjustment, view_size)
+
+        visible = []
+        for chunk_y in range(first_y, last_y + 1):
+            for chunk_x in range(first_x, last_x + 1):
+                visible.append(
+                    (
+                        self.get_chunk(chunk_x, chunk_y),
+                        (
+                            chunk_x * self.chunk_pixels + camera_adjustment[0],
+                            chunk_y * self.chunk_pixels + camera_adjustment[1],
+                        ),
+                    )
+                )
+
+        return visible
+
+    # The current frame of every animated tile in the chunks on screen. Call
+    # after get_visible_chunks so the chunks have been baked.
+    def get_visible_animated_tiles(self, camera_adjustment: tuple, view_size: tuple) -> list:
+        if not self.animated_tiles:
+            return []
+
+        first_x, first_y, last_x, last_y = self.get_visible_range(camera_adjustment, view_size)
+
+        sprites = []
+        for chunk_y in range(first_y, last_y + 1):
+            for chunk_x in range(first_x, last_x + 1):
+                for x, y, tile_id in self.chunk_animated_tiles.get((chunk_x, chunk_y), ()):
+                    sprites.append(
+                        (
+                            self.animated_tiles[tile_id].get_current_sprite(),
+                            (
+                                x * self.tilesize + camera_adjustment[0],
+                                y * self.tilesize + camera_adjustment[1],
+                            ),
+                        )
+                    )
+
+        return sprites
+
+    def render(self, screen: pygame.Surface, camera_adjustment: tuple):
+        # Only the chunks overlapping the screen are drawn, so the cost follows
+        # the screen size rather than the map size
+        screen.blits(
+            self.get_visible_chunks(camera_adjustment, screen.get_size()),
+            doreturn=False,
+        )
+        screen.blits(
+            self.get_visible_animated_tiles(camera_adjustment, screen.get_size()),
+            doreturn=False,
+        )
@@ -16,26 +16,29 @@ class Tileset:
         self.scale_factor = scale_factor
         self.scaled_size = self.tilesize * self.scale_factor
 
+        # Scaling the whole sheet once gives the same pixels as scaling
+        # every tile on its own, since tiles are scaled by whole numbers
+        self.atlas = pygame.transform.scale(
+            self.tilesheet,
+            (
+                self.tilesheet.get_width() * self.scale_factor,
+                self.tilesheet.get_height() * self.scale_factor,
+            ),
+        )
+
         tile_id = 0
-        for y in range(int(self.tilesheet.get_height() / self.tilesize)):
-            for x in range(int(self.tilesheet.get_width() / self.tilesize)):
+        for y in range(int(self.atlas.get_height() / self.scaled_size)):
+            for x in range(int(self.atlas.get_width() / self.scaled_size)):
                 # Sets x, y, height, width cordinates
                 tile_rect = pygame.Rect(
-                    x * self.tilesize, y * self.tilesize, self.tilesize, self.tilesize
-                )
-
-                tile_image = self.tilesheet.subsurface(tile_rect)
-
-                # Allows to scale the tile sizes.
-                tile_image = pygame.transform.scale(
-                    tile_image,
-                    (
-                        tile_image.get_width() * self.scale_factor,
-                        tile_image.get_height() * self.scale_factor,
-                    ),
+                    x * self.scaled_size,
+                    y * self.scaled_size,
+                    self.scaled_size,
+                    self.scaled_size,
                 )
 
-                self.tileset[tile_id] = tile_image
+                # Tiles share their pixels with the atlas
+                self.tileset[tile_id] = self.atlas.subsurface(tile_rect)
 
                 tile_id += 1
 
@@ -44,3 +47,30 @@ class Tileset:
 
     def get_tile_sprite(self, id: int) -> pygame.Surface:
         return self.tileset[id]
+
+
+# Process wide store of tilesets. Every sprite sheet is sliced and scaled
+# once per tile size and scale, then shared by everything that draws it.
+class TilesetRegistry:
+    def __init__(self):
+        self.tilesets = {}
+
+    # sheet is either a filename or an already loaded surface
+    def get(self, sheet, original_tilesize: int, scale_factor: int = 1) -> Tileset:
+        key = (sheet, original_tilesize, scale_factor)
+
+        tileset = self.tilesets.get(key)
+        if tileset is None:
+            if isinstance(sheet, str):
+                tileset = Tileset(sheet, original_tilesize, scale_factor)
+            else:
+                tileset = Tileset("none", original_tilesize, scale_factor, sheet)
+            self.tilesets[key] = tileset
+
+        return tileset
+
+    def clear(self):
+        self.tilesets.clear()
+
+
+tileset_registry = TilesetRegistry()
@@ -0,0 +1,267 @@
+import json
+
+from collections import OrderedDict
+
+from game_files.assets import AssetLoader
+from game_files.config import animated_tiles, opaque_tiles, solid_tiles
+from game_files.lighting import Lighting
+from game_files.pathfinding import NavigationGrid
+from game_files.tiles.paged_map import load_map
+from game_files.tiles.tile_layer import TileLayer
+from game_files.tiles.tilemap import Tilemap
+from game_files.tiles.tileset import tileset_registry
+
+# World files are JSON like
+#
+# {
+#     "start": "island",
+#     "areas": {
+#         "island": {
+#             "map": "game_files/maps/map.json",
+#             "edges": {"right": "east_island"},
+#             "doors": [{"x": 3, "y": 4, "to": "cave", "to_x": 5, "to_y": 6}],
+#             "enemies": [[500, 500]],
+#             "lighting": {
+#                 "ambient": [40, 40, 60],
+#                 "sight": 8,
+#                 "torch": [4, [255, 220, 160]],
+#                 "lights": [[3, 4, 5, [255, 180, 90]]]
+#             }
+#         },
+#         ...
+#     }
+# }
+#
+# Walking off an edge of an area leads to the area named for that edge.
+# Stepping on a door tile leads to tile to_x, to_y of another area. Enemy
+# positions are in pixels. Areas with lighting are dark apart from the
+# ambient colour, lights at tile positions with a radius in tiles, and the
+# player's torch, and are hidden outside what the player can see. A plain
+# map file works as a world of one area.
+EDGES = ("left", "right", "up", "down")
+
+# Sheet, tile size and scale of the tileset areas use unless they say
+DEFAULT_TILESET = ["gfx/rpg_sprites.png", 16, 4]
+
+
+class Door:
+    def __init__(self, x: int, y: int, to: str, to_x: int, to_y: int):
+        self.x = x
+        self.y = y
+        self.to = to
+        self.to_x = to_x
+        self.to_y = to_y
+
+
+class Area:
+    def __init__(self, name: str, spec: dict):
+        self.name = name
+        self.map_path = spec.get("map")
+        # Map already read along with the world file, for one map worlds
+        self.map_spec = spec.get("map_spec")
+        self.tileset = spec.get("tileset", DEFAULT_TILESET)
+        self.edges = spec.get("edges", {})
+        self.doors = [Door(**door) for door in spec.get("doors", [])]
+        self.enemies = spec.get("enemies", [])
+        self.lighting = spec.get("lighting")
+
+        for edge in self.edges:
+            if edge not in EDGES:
+                raise ValueError(f"area {name} has an unknown edge {edge}")
+
+    @property
+    def tilesize(self) -> int:
+        return self.tileset[1] * self.tileset[2]
+
+    # Every area the player can go to from here
+    @property
+    def neighbours(self) -> list:
+        return list(self.edges.values()) + [door.to for door in self.doors]
+
+
+# Reads a world file, or a single map, into a dict of areas and the name of
+# the area to start in
+def load_areas(filename: str) -> tuple:
+    spec = None
+    if filename.endswith(".json"):
+        with open(filename, "r") as world_file:
+            spec = json.load(world_file)
+
+    if not isinstance(spec, dict):
+        # A map on its own, with the enemy the game has always started with
+        spec = {
+            "start": "map",
+            "areas": {"map": {"map": filename, "map_spec": spec, "enemies": [[500, 500]]}},
+        }
+
+    areas = {name: Area(name, area) for name, area in spec["areas"].items()}
+    for area in areas.values():
+        for neighbour in area.neighbours:
+            if neighbour not in areas:
+                raise ValueError(f"area {area.name} leads to unknown area {neighbour}")
+
+    return areas, spec["start"]
+
+
+# Reads an area's tiles and works out where can be walked, and where light
+# can pass for areas with lighting. Doesn't touch pygame, so it can run on
+# the loader's worker thread.
+def load_area_layer(area: Area) -> tuple:
+    layer = area.map_spec if area.map_spec is not None else load_map(area.map_path)
+    if isinstance(layer, list):
+        layer = TileLayer.from_spec(layer)
+
+    sight = None
+    if area.lighting is not None:
+        sight = NavigationGrid(layer, area.tilesize, opaque_tiles)
+
+    return layer, NavigationGrid(layer, area.tilesize, solid_tiles), sight
+
+
+# An area that is ready to play in
+class LoadedArea:
+    def __init__(
+        self,
+        area: Area,
+        tilemap: Tilemap,
+        navigation: NavigationGrid,
+        lighting: Lighting = None,
+        cleared_spawns: set = None,
+    ):
+        self.area = area
+        self.tilemap = tilemap
+        self.navigation = navigation
+        self.lighting = lighting
+        # Indices into area.enemies of the enemies that have been killed, so
+        # they aren't spawned again when the area is entered
+        self.cleared_spawns = cleared_spawns if cleared_spawns is not None else set()
+
+    def get_memory_size(self) -> int:
+        size = self.tilemap.get_memory_size() + self.navigation.get_memory_size()
+        if self.lighting is not None:
+            size += self.lighting.sight.get_memory_size() + self.lighting.get_memory_size()
+        return size
+
+
+# Keeps the areas of a world loaded. Recently used areas stay in memory up to
+# max_cache_bytes, dropping the least recently used first, and the areas next
+# to the player are loaded in the background before the player gets there so
+# moving between areas doesn't stall.
+class WorldManager:
+    def __init__(
+        self,
+        areas: dict,
+        start: str,
+        loader: AssetLoader = None,
+        max_cache_bytes: int = 128 * 2**20,
+        prefetch_distance: int = 256,
+    ):
+        self.areas = areas
+        self.start = start
+        self.loader = loader if loader is not None else AssetLoader()
+        self.max_cache_bytes = max_cache_bytes
+        # How close in pixels the player has to be to an edge or door for
+        # the area past it to be loaded
+        self.prefetch_distance = prefetch_distance
+
+        self.loaded = OrderedDict()
+        self.loading = set()
+        # Killed enemies of each area, kept when the area itself is evicted
+        self.cleared_spawns = {}
+        # Baked a few chunks at a time, so they are ready when entered
+        self.baking = []
+
+    @classmethod
+    def from_file(cls, filename: str, loader: AssetLoader = None, **kwargs):
+        return cls(*load_areas(filename), loader, **kwargs)
+
+    # The area with the given name, loading it now if it isn't already
+    def get(self, name: str) -> LoadedArea:
+        loaded = self.loaded.get(name)
+        if loaded is None:
+            loaded = self.finish_loading(name, load_area_layer(self.areas[name]))
+            loaded.tilemap.bake_chunks()
+        else:
+            self.loaded.move_to_end(name)
+
+        self.evict()
+        return loaded
+
+    # Start loading an area in the background
+    def prefetch(self, name: str):
+        if name in self.loaded or name in self.loading:
+            return
+
+        self.loading.add(name)
+        self.loader.load(
+            "area:" + name,
+            load_area_layer,
+            self.areas[name],
+            finish=lambda result: self.finish_loading(name, result),
+        )
+
+    # Tilemaps hold surfaces, so they are made on the main thread
+    def finish_loading(self, name: str, result: tuple) -> LoadedArea:
+        self.loading.discard(name)
+        if name in self.loaded:
+            return self.loaded[name]
+
+        area = self.areas[name]
+        layer, navigation, sight = result
+        tilemap = Tilemap(
+            layer,
+            tileset_registry.get(*area.tileset),
+            animated_tiles=animated_tiles,
+            prebake=False,
+        )
+        navigation.watch(tilemap)
+
+        lighting = None
+        if sight is not None:
+            sight.watch(tilemap)
+            lighting = Lighting(tilemap, sight, area.lighting)
+
+        loaded = LoadedArea(
+            area, tilemap, navigation, lighting, self.cleared_spawns.setdefault(name, set())
+        )
+        self.loaded[name] = loaded
+        self.baking.append(tilemap)
+        return loaded
+
+    # Drop the least recently used areas until the rest fit, always keeping
+    # the one used last
+    def evict(self):
+        total = sum(loaded.get_memory_size() for loaded in self.loaded.values())
+        while total > self.max_cache_bytes and len(self.loaded) > 1:
+            _, evicted = self.loaded.popitem(last=False)
+            total -= evicted.get_memory_size()
+            if evicted.tilemap in self.baking:
+                self.baking.remove(evicted.tilemap)
+            evicted.tilemap.close()
+
+    # Called every tick with the area the player is in and where they are.
+    # Loads the areas the player is close to and bakes a few chunks.
+    def update(self, current: LoadedArea, x, y, max_chunks: int = 2):
+        self.loader.update()
+
+        area = current.area
+        tilesize = area.tilesize
+        width = current.tilemap.width * tilesize
+        height = current.tilemap.height * tilesize
+        distances = {"left": x, "right": width - x, "up": y, "down": height - y}
+
+        for edge, neighbour in area.edges.items():
+            if distances[edge] < self.prefetch_distance:
+                self.prefetch(neighbour)
+
+        for door in area.doors:
+            door_x = (door.x + 0.5) * tilesize
+            door_y = (door.y + 0.5) * tilesize
+            if abs(door_x - x) < self.prefetch_distance and abs(door_y - y) < self.prefetch_distance:
+                self.prefetch(door.to)
+
+        while self.baking and max_chunks > 0:
+            if self.baking[0].bake_chunks(1):
+                self.baking.pop(0)
+            else:
+                max_chunks -= 1
@@ -1,6 +1,12 @@
+import os
+import random
 import pygame
-import time
 
+from game_files.assets import SPRITE_FILES, AssetLoader
+from game_files.config import profiler_trace, replay_record
+from game_files.profiler import profiler
+from game_files.replay import ReplayRecorder, seed_random
+from game_files.world_manager import WorldManager, load_areas
 from game_files.pygame_util import SceneManager
 
 from game_files.scenes.main_scene import MainScene
@@ -8,50 +14,88 @@ from game_files.scenes.menu import MenuScene
 
 
 class Game:
-    def __init__(self):
+    def __init__(
+        self,
+        screen_size: tuple = (1280, 720),
+        headless: bool = False,
+        map_path: str = "game_files/maps/world.json",
+    ):
+        # Without a display SDL draws to memory only, used for benchmarks
+        # and CI machines
+        if headless:
+            os.environ["SDL_VIDEODRIVER"] = "dummy"
+
         # Initialize global game variables
         pygame.init()
-        self.screen = pygame.display.set_mode((1280, 720))
+        self.screen = pygame.display.set_mode(screen_size)
         self.running = True
-        self.sprites = self.load_sprites()
+        self.map_path = map_path
+
+        # Sprites, the world and the area the player starts in are loaded in
+        # the background while the menu is up, so the first frame doesn't
+        # wait on them
+        self.loader = AssetLoader()
+        self.loader.load_sprites()
+        self.loader.load("world", load_areas, map_path, finish=self.create_world)
+        self.assets = self.loader.assets
+        # Filled in from the loaded assets once they are all ready
+        self.sprites = {}
 
         # Scene system
         self.scene_manager = SceneManager()
 
-        # All possible scenes
+        # All possible scenes. The main scene is only built once the player
+        # starts the game.
         scenes = {
-            "main": MainScene(self.scene_manager, self.screen, self.sprites),
-            "menu": MenuScene(self.scene_manager, self.screen, self.sprites),
+            "main": self.create_main_scene,
+            "menu": MenuScene(self.scene_manager, self.screen, self.sprites, self.loader),
         }
         self.scene_manager.initialize(scenes, "menu")
 
+    def create_world(self, areas: tuple) -> WorldManager:
+        world = WorldManager(*areas, self.loader)
+        world.prefetch(world.start)
+        return world
+
+    def create_main_scene(self) -> MainScene:
+        # Recording starts with the main scene, from a known random seed
+        if replay_record is not None:
+            seed = random.randrange(2**32)
+            seed_random(seed)
+
+        self.sprites.update((name, self.assets[name]) for name in SPRITE_FILES)
+        scene = MainScene(
+            self.scene_manager, self.screen, self.sprites, world=self.assets["world"]
+        )
+
+        if replay_record is not None:
+            self.scene_manager.input.recorder = ReplayRecorder(
+                seed, self.scene_manager.loop.dt, self.map_path
+            )
+        return scene
+
     # Main Game Loop
     def run(self):
-        self.previous_time = time.time()
         while self.running:
-            self.scene_manager.current_scene.poll_events()
-            self.scene_manager.current_scene.update()
-            self.scene_manager.current_scene.render()
+            self.loader.update()
+            self.scene_manager.run_frame()
 
             if self.scene_manager.quit is True:
                 self.running = False
 
-        pygame.quit()
+        if profiler_trace is not None and profiler.frames:
+            profiler.export(profiler_trace)
 
-    # Load sprite textures into pygame as surfaces.
-    # Returns a dictionary of names to surfaces.
-    def load_sprites(self) -> dict:
-        sprites = {}
+        if self.scene_manager.input.recorder is not None:
+            self.scene_manager.input.recorder.save(replay_record)
+
+        pygame.quit()
 
-        sprites["enemy_idle"] = pygame.image.load("gfx/enemy_idle.png").convert_alpha()
-        sprites["player_walk"] = pygame.image.load(
-            "gfx/player_animations.png"
-        ).convert_alpha()
-        sprites["player_attack"] = pygame.image.load("gfx/attack.png").convert_alpha()
-        sprites["projectile"] = pygame.image.load("gfx/projectile.png").convert_alpha()
 
-        return sprites
+def main():
+    game = Game()
+    game.run()
 
 
-game = Game()
-game.run()
+if __name__ == "__main__":
+    main()
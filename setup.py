@@ -9,6 +9,10 @@ setup(
     author_email='DTNevaeha@gmail.com',
     url='https://github.com/DTNevaeha/top_down_RPG',
     packages=find_packages(),
+    install_requires=[
+        'numpy',
+        'pygame',
+    ],
     entry_point={
         'console_scripts': [
             'rpg-template-cli = top_down_rpg.main:main',